@@ -1,348 +1,195 @@
-from flask import Flask, render_template, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import subprocess
+import sys
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'hydrafind-india-secret-key-2025'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hydrafind_india.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+import click
 
-db = SQLAlchemy(app)
+from extensions import db, limiter, photo_store, scheduler
 
-# Database Models
-class Resource(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-    latitude = db.Column(db.Float, nullable=False)
-    longitude = db.Column(db.Float, nullable=False)
-    resource_type = db.Column(db.String(20), nullable=False)  # 'water' or 'washroom'
-    address = db.Column(db.String(200))
-    city = db.Column(db.String(50))
-    is_verified = db.Column(db.Boolean, default=False)
-    rating = db.Column(db.Float, default=0.0)
-    total_ratings = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    submitted_by = db.Column(db.String(100))
+# Budget for `python -X importtime -c "import app; app.create_app()"`,
+# checked by `flask --app app check-import-time`
+IMPORT_TIME_BUDGET_MS = 800
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'latitude': self.latitude,
-            'longitude': self.longitude,
-            'resource_type': self.resource_type,
-            'address': self.address,
-            'city': self.city,
-            'is_verified': self.is_verified,
-            'rating': self.rating,
-            'total_ratings': self.total_ratings,
-            'created_at': self.created_at.isoformat(),
-            'submitted_by': self.submitted_by
-        }
-
-class Rating(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), nullable=False)
-    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
-    comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_ip = db.Column(db.String(45))
-
-# Routes
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/api/resources')
-def get_resources():
-    resource_type = request.args.get('type', 'all')
-    city = request.args.get('city', 'all')
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'hydrafind-india-secret-key-2025'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hydrafind_india.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
-    query = Resource.query
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is
+    # trusted for the client address (Heroku's router is one)
+    app.config['PROXY_COUNT'] = int(os.environ.get('HYDRAFIND_PROXY_COUNT', '1' if 'DYNO' in os.environ else '0'))
     
-    if resource_type != 'all':
-        query = query.filter_by(resource_type=resource_type)
+    # Per-IP, per-route request limits; anything not listed uses RATELIMIT_DEFAULT.
+    # Counters are per process unless a Redis URL is given.
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('HYDRAFIND_RATELIMIT_STORAGE_URL') or os.environ.get('REDIS_URL')
+    app.config['RATELIMIT_DEFAULT'] = '120/minute'
+    app.config['RATELIMITS'] = {
+        'main.add_resource': '10/hour',
+        'main.rate_resource': '30/hour',
+        'main.search_resources': '60/minute',
+        'main.upload_photo': '20/hour',
+        'main.photo_file': '600/minute',
+        'main.get_coverage_map': '30/minute'
+    }
     
-    if city != 'all':
-        query = query.filter_by(city=city)
+    # Photo uploads are stored under instance/photos by default. Set
+    # HYDRAFIND_X_SENDFILE=1 behind nginx/Apache so the web server streams
+    # photo files instead of a Flask worker.
+    app.config['PHOTO_MAX_BYTES'] = 10 * 1024 * 1024
+    app.config['USE_X_SENDFILE'] = os.environ.get('HYDRAFIND_X_SENDFILE') == '1'
     
-    resources = query.all()
-    return jsonify([resource.to_dict() for resource in resources])
-
-@app.route('/api/resources', methods=['POST'])
-def add_resource():
-    data = request.get_json()
+    # Background maintenance jobs (set HYDRAFIND_SCHEDULER=0 to disable)
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('HYDRAFIND_SCHEDULER', '1') != '0'
+    # Nothing marks resources as verified yet, so expiring unverified ones
+    # would remove every submission; set a number of days to enable it
+    app.config['UNVERIFIED_TTL_DAYS'] = None
     
-    try:
-        resource = Resource(
-            name=data['name'],
-            description=data.get('description', ''),
-            latitude=float(data['latitude']),
-            longitude=float(data['longitude']),
-            resource_type=data['resource_type'],
-            address=data.get('address', ''),
-            city=data.get('city', ''),
-            submitted_by=data.get('submitted_by', 'Anonymous')
-        )
-        
-        db.session.add(resource)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Resource added successfully!',
-            'resource': resource.to_dict()
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'message': f'Error adding resource: {str(e)}'
-        }), 400
-
-@app.route('/api/resources/<int:resource_id>/rate', methods=['POST'])
-def rate_resource(resource_id):
-    data = request.get_json()
-    user_ip = request.remote_addr
+    # Rating model: recent ratings count more, halving in weight every
+    # RATING_HALF_LIFE_DAYS, and scores are smoothed towards a prior mean
+    app.config['RATING_HALF_LIFE_DAYS'] = 90
+    app.config['RATING_PRIOR_MEAN'] = 3.0
+    app.config['RATING_PRIOR_WEIGHT'] = 5
     
-    # Check if user already rated this resource
-    existing_rating = Rating.query.filter_by(
-        resource_id=resource_id,
-        user_ip=user_ip
-    ).first()
+    # Event log: snapshot once this many events have accumulated, and keep
+    # snapshotted events for EVENT_RETENTION_DAYS before compacting them
+    app.config['EVENT_SNAPSHOT_INTERVAL'] = 10000
+    app.config['EVENT_RETENTION_DAYS'] = 30
+    app.config['EVENT_SNAPSHOTS_KEPT'] = 3
     
-    if existing_rating:
-        return jsonify({
-            'success': False,
-            'message': 'You have already rated this resource'
-        }), 400
+    # Coverage maps treat cells farther than this from a resource as gaps
+    app.config['COVERAGE_WALK_KM'] = 1.0
     
-    try:
-        rating = Rating(
-            resource_id=resource_id,
-            rating=int(data['rating']),
-            comment=data.get('comment', ''),
-            user_ip=user_ip
-        )
-        
-        db.session.add(rating)
-        
-        # Update resource rating
-        resource = Resource.query.get(resource_id)
-        if resource:
-            total_rating = (resource.rating * resource.total_ratings) + int(data['rating'])
-            resource.total_ratings += 1
-            resource.rating = total_rating / resource.total_ratings
-            
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Rating added successfully!',
-            'new_rating': resource.rating
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'message': f'Error adding rating: {str(e)}'
-        }), 400
+    if config:
+        app.config.update(config)
+    
+    # Caps every request body, including multipart uploads (which Werkzeug
+    # buffers before the view runs) and chunked bodies with no Content-Length
+    if app.config['MAX_CONTENT_LENGTH'] is None:
+        app.config['MAX_CONTENT_LENGTH'] = app.config['PHOTO_MAX_BYTES'] + 64 * 1024
+    
+    # Models and views are imported here so that `import app` stays cheap.
+    # db.init_app() builds the SQLAlchemy engine (Flask-SQLAlchemy 3.0 does
+    # this eagerly); only the first connection waits until the first query.
+    import maintenance  # noqa: F401 - registers the background jobs
+    from events import events_cli
+    from models import Job
+    from views import bp
+    
+    if app.config['PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
+    
+    db.init_app(app)
+    limiter.init_app(app)
+    photo_store.init_app(app)
+    scheduler.init_app(app, db, Job)
+    app.register_blueprint(bp)
+    
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(geocode_backfill_command)
+    app.cli.add_command(check_import_time_command)
+    app.cli.add_command(events_cli)
+    
+    return app
 
-@app.route('/api/search')
-def search_resources():
-    query = request.args.get('q', '').lower()
-    resource_type = request.args.get('type', 'all')
-    city = request.args.get('city', 'all')
+def migrate():
+    from events import ensure_baseline
+    from maintenance import backfill_derived_fields, migrate_schema
+    from spatial import ensure_spatial_index
     
-    resources_query = Resource.query
+    if db.engine.dialect.name == 'sqlite':
+        # WAL is stored in the database file; it lets the streaming ASGI
+        # reads run alongside writes
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+    db.create_all()
+    migrate_schema()
+    # Rows from before the event log are snapshotted first; the backfills
+    # below are then logged on top of them
+    ensure_baseline()
+    ensure_spatial_index()
+    backfill_derived_fields()
+
+@click.command('migrate')
+def migrate_command():
+    """Create missing tables and columns and backfill derived fields."""
+    migrate()
+    click.echo('Database schema is up to date.')
+
+@click.command('seed')
+def seed_command():
+    """Add the sample resources for Indian cities (safe to re-run)."""
+    from maintenance import backfill_derived_fields
+    from seed import seed_database
     
-    if resource_type != 'all':
-        resources_query = resources_query.filter_by(resource_type=resource_type)
+    migrate()
+    added = seed_database()
+    backfill_derived_fields()
+    click.echo(f'Added {added} sample resources.')
+
+@click.command('geocode-backfill')
+@click.option('--batch-size', default=1000, help='Rows per transaction.')
+def geocode_backfill_command(batch_size):
+    """Assign canonical city and locality to existing resources."""
+    from geocode import reverse_geocode_cache_info
+    from maintenance import backfill_geocoding
     
-    if city != 'all':
-        resources_query = resources_query.filter_by(city=city)
+    updated = backfill_geocoding(batch_size)
+    info = reverse_geocode_cache_info()
+    click.echo(f'Updated {updated} resources ({info.hits} cache hits, {info.misses} lookups).')
+
+@click.command('check-import-time')
+@click.option('--budget', default=IMPORT_TIME_BUDGET_MS, help='Budget in milliseconds.')
+def check_import_time_command(budget):
+    """Fail if importing the app and building it exceeds the budget."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise click.ClickException(result.stderr.strip().splitlines()[-1])
     
-    if query:
-        resources_query = resources_query.filter(
-            db.or_(
-                Resource.name.ilike(f'%{query}%'),
-                Resource.description.ilike(f'%{query}%'),
-                Resource.address.ilike(f'%{query}%')
-            )
-        )
+    # Each line is "import time: self | cumulative | module"; top-level
+    # imports are the ones without indentation
+    total = 0
+    slowest = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        if not module.startswith(' ') or module[1] == ' ':
+            continue
+        total += int(cumulative)
+        slowest.append((int(cumulative), module.strip()))
     
-    resources = resources_query.all()
-    return jsonify([resource.to_dict() for resource in resources])
+    for cumulative, module in sorted(slowest, reverse=True)[:5]:
+        click.echo(f'{cumulative / 1000:8.1f} ms  {module}')
+    click.echo(f'{total / 1000:8.1f} ms  total (budget {budget} ms)')
+    if total / 1000 > budget:
+        raise click.ClickException('Import time is over budget')
 
-@app.route('/api/cities')
-def get_cities():
-    cities = db.session.query(Resource.city).distinct().all()
-    return jsonify([city[0] for city in cities if city[0]])
+def __getattr__(name):
+    # `gunicorn app:app` and `from app import app` build the default
+    # application on first access instead of at import time
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
+        migrate()
         
         # Add sample data for Indian cities if database is empty
+        from maintenance import backfill_derived_fields
+        from models import Resource
+        from seed import seed_database
         if Resource.query.count() == 0:
-            indian_resources = [
-                # Delhi
-                Resource(
-                    name="India Gate Water Fountain",
-                    description="Public water fountain near India Gate, available 24/7",
-                    latitude=28.6129,
-                    longitude=77.2295,
-                    resource_type="water",
-                    address="India Gate, New Delhi",
-                    city="Delhi",
-                    is_verified=True,
-                    rating=4.2,
-                    total_ratings=25,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="Connaught Place Public Restroom",
-                    description="Clean public restrooms in CP, wheelchair accessible",
-                    latitude=28.6315,
-                    longitude=77.2167,
-                    resource_type="washroom",
-                    address="Connaught Place, New Delhi",
-                    city="Delhi",
-                    is_verified=True,
-                    rating=3.8,
-                    total_ratings=18,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="Red Fort Water Station",
-                    description="Free water refill station near Red Fort entrance",
-                    latitude=28.6562,
-                    longitude=77.2410,
-                    resource_type="water",
-                    address="Red Fort, Delhi",
-                    city="Delhi",
-                    is_verified=True,
-                    rating=4.0,
-                    total_ratings=12,
-                    submitted_by="Admin"
-                ),
-                
-                # Mumbai
-                Resource(
-                    name="Gateway of India Water Point",
-                    description="Public water fountain at Gateway of India",
-                    latitude=18.9220,
-                    longitude=72.8347,
-                    resource_type="water",
-                    address="Gateway of India, Mumbai",
-                    city="Mumbai",
-                    is_verified=True,
-                    rating=4.1,
-                    total_ratings=30,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="Marine Drive Public Facilities",
-                    description="Clean restrooms along Marine Drive",
-                    latitude=18.9434,
-                    longitude=72.8234,
-                    resource_type="washroom",
-                    address="Marine Drive, Mumbai",
-                    city="Mumbai",
-                    is_verified=True,
-                    rating=4.3,
-                    total_ratings=22,
-                    submitted_by="Admin"
-                ),
-                
-                # Bengaluru
-                Resource(
-                    name="Cubbon Park Water Fountain",
-                    description="Multiple water fountains throughout Cubbon Park",
-                    latitude=12.9716,
-                    longitude=77.5946,
-                    resource_type="water",
-                    address="Cubbon Park, Bengaluru",
-                    city="Bengaluru",
-                    is_verified=True,
-                    rating=4.4,
-                    total_ratings=35,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="MG Road Metro Station Facilities",
-                    description="Modern restrooms at MG Road Metro Station",
-                    latitude=12.9759,
-                    longitude=77.6069,
-                    resource_type="washroom",
-                    address="MG Road Metro Station, Bengaluru",
-                    city="Bengaluru",
-                    is_verified=True,
-                    rating=4.5,
-                    total_ratings=28,
-                    submitted_by="Admin"
-                ),
-                
-                # Hyderabad
-                Resource(
-                    name="Charminar Water Station",
-                    description="Public water facility near Charminar",
-                    latitude=17.3616,
-                    longitude=78.4747,
-                    resource_type="water",
-                    address="Charminar, Hyderabad",
-                    city="Hyderabad",
-                    is_verified=True,
-                    rating=3.9,
-                    total_ratings=20,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="Hussain Sagar Lake Restrooms",
-                    description="Public facilities near Hussain Sagar Lake",
-                    latitude=17.4239,
-                    longitude=78.4738,
-                    resource_type="washroom",
-                    address="Hussain Sagar, Hyderabad",
-                    city="Hyderabad",
-                    is_verified=True,
-                    rating=4.0,
-                    total_ratings=15,
-                    submitted_by="Admin"
-                ),
-                
-                # Lucknow
-                Resource(
-                    name="Bara Imambara Water Point",
-                    description="Water facility at Bara Imambara complex",
-                    latitude=26.8695,
-                    longitude=80.9124,
-                    resource_type="water",
-                    address="Bara Imambara, Lucknow",
-                    city="Lucknow",
-                    is_verified=True,
-                    rating=3.7,
-                    total_ratings=14,
-                    submitted_by="Admin"
-                ),
-                Resource(
-                    name="Hazratganj Public Restroom",
-                    description="Clean public restrooms in Hazratganj market area",
-                    latitude=26.8467,
-                    longitude=80.9462,
-                    resource_type="washroom",
-                    address="Hazratganj, Lucknow",
-                    city="Lucknow",
-                    is_verified=True,
-                    rating=3.6,
-                    total_ratings=11,
-                    submitted_by="Admin"
-                )
-            ]
-            
-            for resource in indian_resources:
-                db.session.add(resource)
-            db.session.commit()
+            seed_database()
+            backfill_derived_fields()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
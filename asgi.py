@@ -0,0 +1,155 @@
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import create_app
+from extensions import db, limiter
+from models import Resource, filter_resources
+from ratelimit import client_key
+
+# ASGI entry point: `uvicorn asgi:app`
+#
+# The read API (/api/resources, /api/search, /api/cities) is served natively
+# with async SQLite access through aiosqlite, streaming JSON arrays in
+# batches straight from the cursor: only BATCH_SIZE rows are held in memory
+# and each `send` waits on the server's flow control. The database runs in
+# WAL mode, so a slow client's open read transaction doesn't block writers,
+# and connections aren't pooled, so slow clients can't exhaust a pool either.
+# Every other route falls through to the Flask app, which keeps the two entry
+# points interchangeable for benchmarking (`gunicorn app:app`).
+
+BATCH_SIZE = 200
+
+
+def enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+class ReadAPI:
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.routes = {
+            '/api/resources': ('main.get_resources', self.resources),
+            '/api/search': ('main.search_resources', self.search),
+            '/api/cities': ('main.get_cities', self.cities)
+        }
+        self.engine = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        route = self.routes.get(scope.get('path'))
+        if scope['type'] != 'http' or scope['method'] != 'GET' or route is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        endpoint, handler = route
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        if 'lat' in args and 'lng' in args:
+            # Nearest-resource search stays on the synchronous Flask view
+            await self.fallback(scope, receive, send)
+            return
+        if await self.rate_limited(scope, endpoint, send):
+            return
+        await handler(args, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.get_engine()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def get_engine(self):
+        if self.engine is None:
+            with flask_app.app_context():
+                url = db.engine.url.set(drivername='sqlite+aiosqlite')
+            self.engine = create_async_engine(url, poolclass=NullPool)
+            event.listen(self.engine.sync_engine, 'connect', enable_wal)
+        return self.engine
+
+    async def rate_limited(self, scope, endpoint, send):
+        if not flask_app.config['RATELIMIT_ENABLED']:
+            return False
+        client = client_key((scope.get('client') or ('unknown', 0))[0])
+        limit, window = limiter.limits.get(endpoint, limiter.default_limit)
+        retry_after = limiter.hit(f'{client}:{endpoint}', limit, window)
+        if not retry_after:
+            return False
+
+        body = flask_app.json.dumps({
+            'success': False,
+            'message': 'Too many requests, please slow down and try again shortly'
+        }).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 429,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(int(retry_after + 0.999)).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        return True
+
+    async def resources(self, args, send):
+        await self.stream_resources(filter_resources(select(Resource.__table__), args), send)
+
+    async def search(self, args, send):
+        await self.stream_resources(filter_resources(select(Resource.__table__), args, search=True), send)
+
+    async def cities(self, args, send):
+        async with self.get_engine().connect() as connection:
+            result = await connection.execute(select(Resource.city).distinct())
+            cities = [city for (city,) in result if city]
+        body = flask_app.json.dumps(cities).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream_resources(self, statement, send):
+        dumps = flask_app.json.dumps
+        prefix = b'['
+        async with self.get_engine().connect() as connection:
+            result = await connection.stream(statement)
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'application/json')]
+            })
+            async for rows in result.partitions(BATCH_SIZE):
+                # Transient Resource objects reuse to_dict() so both entry
+                # points return identical JSON
+                chunk = ','.join(dumps(Resource(**row._mapping).to_dict()) for row in rows)
+                await send({
+                    'type': 'http.response.body',
+                    'body': prefix + chunk.encode(),
+                    'more_body': True
+                })
+                prefix = b','
+        await send({
+            'type': 'http.response.body',
+            'body': b'[]' if prefix == b'[' else b']'
+        })
+
+flask_app = create_app()
+app = ReadAPI(WSGIMiddleware(flask_app))
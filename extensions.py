@@ -0,0 +1,12 @@
+from flask_sqlalchemy import SQLAlchemy
+
+from jobs import Scheduler
+from photos import PhotoStore
+from ratelimit import RateLimiter
+
+# Extension instances are created unbound and attached to an app in
+# create_app(), so importing them has no side effects
+db = SQLAlchemy()
+limiter = RateLimiter()
+scheduler = Scheduler()
+photo_store = PhotoStore()
@@ -0,0 +1,139 @@
+import json
+import os
+from functools import lru_cache
+
+# Offline reverse geocoding
+#
+# City and locality boundaries come from a bundled GeoJSON file
+# (data/boundaries.geojson). They are coarse hand-drawn outlines around each
+# city's core, not administrative boundaries, so they only fill in missing
+# data and never override what a user submitted. Polygons are bucketed into a coarse grid by their
+# bounding boxes, so a lookup only runs point-in-polygon tests against the
+# few polygons overlapping the point's cell. Results are cached by coordinates
+# quantized to 3 decimal places (about 110 m), which is where most repeated
+# lookups for the same place land.
+
+BOUNDARIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'boundaries.geojson')
+CELL_DEGREES = 0.1
+QUANTIZE = 1000
+
+
+class BoundaryIndex:
+    def __init__(self, features):
+        self.polygons = []  # (level, name, city, bbox, rings)
+        self.cells = {}
+        self.aliases = {}
+        self.cities = {}  # name -> list of polygons (lists of rings)
+
+        for feature in features:
+            properties = feature['properties']
+            geometry = feature['geometry']
+            polygons = geometry['coordinates']
+            if geometry['type'] == 'Polygon':
+                polygons = [polygons]
+
+            name = properties['name']
+            if properties['level'] == 'city':
+                self.aliases[name.lower()] = name
+                for alias in properties.get('aliases', []):
+                    self.aliases[alias.lower()] = name
+
+            for rings in polygons:
+                lngs = [point[0] for point in rings[0]]
+                lats = [point[1] for point in rings[0]]
+                bbox = (min(lats), max(lats), min(lngs), max(lngs))
+                index = len(self.polygons)
+                self.polygons.append((properties['level'], name, properties.get('city', name), bbox, rings))
+                if properties['level'] == 'city':
+                    self.cities.setdefault(name, []).append(rings)
+                for cell in self._cells_for(bbox):
+                    self.cells.setdefault(cell, []).append(index)
+
+    @staticmethod
+    def _cells_for(bbox):
+        min_lat, max_lat, min_lng, max_lng = bbox
+        for i in range(int(min_lat // CELL_DEGREES), int(max_lat // CELL_DEGREES) + 1):
+            for j in range(int(min_lng // CELL_DEGREES), int(max_lng // CELL_DEGREES) + 1):
+                yield i, j
+
+    def lookup(self, lat, lng):
+        """Return (city, locality) for a point; either may be None."""
+        city = locality = None
+        cell = (int(lat // CELL_DEGREES), int(lng // CELL_DEGREES))
+        for index in self.cells.get(cell, ()):
+            level, name, parent, (min_lat, max_lat, min_lng, max_lng), rings = self.polygons[index]
+            if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                continue
+            if not point_in_polygon(lat, lng, rings):
+                continue
+            if level == 'locality':
+                locality, city = name, parent
+            elif city is None:
+                city = name
+        return city, locality
+
+
+def point_in_polygon(lat, lng, rings):
+    # Even-odd ray casting; holes (inner rings) flip the result back
+    inside = False
+    for ring in rings:
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+@lru_cache(maxsize=1)
+def boundary_index():
+    with open(BOUNDARIES_PATH) as f:
+        return BoundaryIndex(json.load(f)['features'])
+
+
+@lru_cache(maxsize=65536)
+def _lookup_cell(qlat, qlng):
+    return boundary_index().lookup(qlat / QUANTIZE, qlng / QUANTIZE)
+
+
+def reverse_geocode(lat, lng):
+    """Return (city, locality) for a point; either may be None."""
+    return _lookup_cell(round(lat * QUANTIZE), round(lng * QUANTIZE))
+
+
+def reverse_geocode_cache_info():
+    return _lookup_cell.cache_info()
+
+
+def canonical_city(name):
+    """Map a free-text city name (e.g. 'Bangalore') to its canonical form."""
+    if not name:
+        return name
+    cleaned = ' '.join(name.split())
+    return boundary_index().aliases.get(cleaned.lower(), cleaned)
+
+
+def city_boundary(name):
+    """Return the polygons of a city (after alias normalisation), or None."""
+    return boundary_index().cities.get(canonical_city(name))
+
+
+def geocode_resource(resource):
+    """Normalise the resource's city and fill in city and locality from its coordinates.
+
+    The bundled boundaries are approximate, so a city the user submitted is
+    kept (only its alias is normalised) and a locality is only assigned when
+    it lies in that city; the boundary city is used only when none was given.
+    Returns True if either field changed.
+    """
+    city, locality = reverse_geocode(resource.latitude, resource.longitude)
+    submitted = canonical_city(resource.city)
+    if submitted and submitted != city:
+        city, locality = submitted, None
+    city = city or submitted
+    changed = (city, locality) != (resource.city, resource.locality)
+    resource.city = city
+    resource.locality = locality
+    return changed
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+# Weekly opening hours as bitmaps
+#
+# Each day is stored as a 48-bit integer where bit s is set when the resource
+# is open for the whole half hour starting at s * 30 minutes (local time).
+# Seven such integers fit in ordinary 64-bit SQLite INTEGER columns, so "open
+# now" is a single bitwise AND on the current day's column, evaluated in SQL.
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+# India has a single time zone and no daylight saving
+INDIA_TZ = timezone(timedelta(hours=5, minutes=30))
+
+
+def _parse_time(value):
+    hours, _, minutes = value.strip().partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f'Invalid time: {value}')
+    return hours * 60 + minutes
+
+
+def _set_range(masks, day, spec):
+    start, sep, end = spec.partition('-')
+    if not sep:
+        raise ValueError(f'Invalid opening hours range: {spec}')
+    start, end = _parse_time(start), _parse_time(end)
+    if end <= start:
+        # Overnight ranges such as 20:00-02:00 continue into the next day
+        end += 24 * 60
+
+    # Only slots that are covered completely count as open
+    for slot in range(-(-start // SLOT_MINUTES), end // SLOT_MINUTES):
+        masks[(day + slot // SLOTS_PER_DAY) % 7] |= 1 << (slot % SLOTS_PER_DAY)
+
+
+def parse_opening_hours(value):
+    """Parse opening hours into a list of seven daily bitmaps (Mon-Sun).
+
+    Accepts '24/7', a single daily range such as '06:00-22:00', or a dict of
+    day ('mon'..'sun' or 'daily') to comma-separated ranges, '24h' or 'closed'.
+    """
+    if isinstance(value, str):
+        value = {'daily': value}
+    if not isinstance(value, dict):
+        raise ValueError('Opening hours must be a string or an object of days')
+
+    # Work out each day's own spec first: 'daily' applies to every day and
+    # named days override it, whatever order the keys come in
+    specs = [None] * 7
+    overrides = {}
+    for key, spec in value.items():
+        if not isinstance(key, str) or not isinstance(spec, str):
+            raise ValueError('Opening hours must map day names to strings')
+        key = key.strip().lower()
+        if key == 'daily':
+            specs = [spec] * 7
+        elif key[:3] in DAYS:
+            overrides[DAYS.index(key[:3])] = spec
+        else:
+            raise ValueError(f'Unknown day: {key}')
+    for day, spec in overrides.items():
+        specs[day] = spec
+
+    # Ranges are only ever added, so a day marked 'closed' still keeps the
+    # part of the previous night's range that runs past midnight
+    masks = [0] * 7
+    for day, spec in enumerate(specs):
+        if spec is None:
+            continue
+        spec = spec.strip().lower()
+        if spec in ('24/7', '24h', 'open'):
+            masks[day] |= FULL_DAY
+        elif spec != 'closed':
+            for part in spec.split(','):
+                _set_range(masks, day, part)
+    return masks
+
+
+def _format_slot(slot):
+    minutes = slot * SLOT_MINUTES
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def format_opening_hours(masks):
+    """Render daily bitmaps back into {'mon': '06:00-22:00', ...}."""
+    result = {}
+    for day, mask in zip(DAYS, masks):
+        ranges = []
+        slot = 0
+        while slot < SLOTS_PER_DAY:
+            if mask >> slot & 1:
+                start = slot
+                while slot < SLOTS_PER_DAY and mask >> slot & 1:
+                    slot += 1
+                ranges.append(f'{_format_slot(start)}-{_format_slot(slot)}')
+            else:
+                slot += 1
+        result[day] = ', '.join(ranges) or 'closed'
+    return result
+
+
+def current_slot(now=None):
+    """Return (day_index, slot) for now in Indian Standard Time."""
+    now = now or datetime.now(INDIA_TZ)
+    if now.tzinfo is not None:
+        now = now.astimezone(INDIA_TZ)
+    return now.weekday(), (now.hour * 60 + now.minute) // SLOT_MINUTES
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+
+logger = logging.getLogger(__name__)
+
+# In-process background scheduler
+#
+# Periodic tasks are registered with @scheduler.task and their schedule and
+# last outcome are persisted in the job table, so restarts don't reset the
+# clock. A single daemon thread per process polls for due jobs; each run is
+# claimed with a short lease first, so several Gunicorn workers can share the
+# table without running the same job twice.
+
+
+class Scheduler:
+    def __init__(self, app=None, db=None, model=None):
+        self.db = db
+        self.model = model
+        self.tasks = {}
+        self._thread = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        app.config.setdefault('SCHEDULER_ENABLED', True)
+        app.config.setdefault('SCHEDULER_POLL_SECONDS', 30)
+        app.config.setdefault('SCHEDULER_LEASE_SECONDS', 600)
+        # Start lazily with the first request so imports and CLI commands
+        # don't spawn threads
+        app.before_request(self._start_once)
+
+    def task(self, name, every):
+        """Register a periodic task that runs every `every` seconds."""
+        def decorator(func):
+            self.tasks[name] = (func, every)
+            return func
+        return decorator
+
+    def _start_once(self):
+        if not self._started:
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._started or not self.app.config['SCHEDULER_ENABLED']:
+                self._started = True
+                return
+            self._started = True
+            self._thread = threading.Thread(target=self._run, name='hydrafind-scheduler', daemon=True)
+            self._thread.start()
+
+    def run_now(self, name):
+        """Mark a job as due immediately and wake the worker thread."""
+        Job = self.model
+        self.db.session.execute(
+            update(Job).where(Job.name == name).values(next_run_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+        self._wakeup.set()
+
+    def sync_jobs(self):
+        Job = self.model
+        existing = {job.name: job for job in Job.query.all()}
+        for name, (_, every) in self.tasks.items():
+            job = existing.get(name)
+            if job is None:
+                self.db.session.add(Job(name=name, interval=every, next_run_at=datetime.utcnow()))
+            elif job.interval != every:
+                job.interval = every
+        self.db.session.commit()
+
+    def run_pending(self):
+        """Run every registered job that is due. Returns the names that ran."""
+        Job = self.model
+        now = datetime.utcnow()
+        due = Job.query.filter(Job.next_run_at <= now).order_by(Job.next_run_at).all()
+        ran = []
+        for job in due:
+            if job.name in self.tasks and self._claim(job.name, now):
+                self._execute(job.name)
+                ran.append(job.name)
+        return ran
+
+    def _claim(self, name, now):
+        Job = self.model
+        lease = timedelta(seconds=self.app.config['SCHEDULER_LEASE_SECONDS'])
+        result = self.db.session.execute(
+            update(Job)
+            .where(Job.name == name)
+            .where(Job.next_run_at <= now)
+            .where(or_(Job.locked_until.is_(None), Job.locked_until < now))
+            .values(locked_until=now + lease)
+        )
+        self.db.session.commit()
+        return result.rowcount == 1
+
+    def _execute(self, name):
+        Job = self.model
+        func, every = self.tasks[name]
+        started = time.perf_counter()
+        status, error = 'ok', None
+        try:
+            func()
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            logger.exception('Background job %s failed', name)
+            status, error = 'error', str(e)
+
+        job = Job.query.filter_by(name=name).first()
+        finished = datetime.utcnow()
+        job.last_run_at = finished
+        job.last_status = status
+        job.last_error = error
+        job.last_duration = time.perf_counter() - started
+        job.run_count = (job.run_count or 0) + 1
+        job.next_run_at = finished + timedelta(seconds=every)
+        job.locked_until = None
+        self.db.session.commit()
+
+    def _run(self):
+        synced = False
+        while True:
+            with self.app.app_context():
+                try:
+                    if not synced:
+                        self.sync_jobs()
+                        synced = True
+                    self.run_pending()
+                except Exception:
+                    self.db.session.rollback()
+                    logger.exception('Background scheduler iteration failed')
+            self._wakeup.wait(self.app.config['SCHEDULER_POLL_SECONDS'])
+            self._wakeup.clear()
@@ -0,0 +1,175 @@
+from flask import current_app
+from sqlalchemy import inspect
+from datetime import datetime, timedelta
+
+from events import RESOURCE_DELETED, RESOURCE_UPDATED, compact, record, take_snapshot
+from extensions import db, scheduler
+from geocode import geocode_resource
+from hours import DAYS
+from models import Photo, Resource, Rating
+
+# Schema maintenance
+def migrate_schema():
+    # create_all() never alters existing tables, so add any columns that
+    # were introduced after the database was created
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                default = ''
+                if column.default is not None and column.default.is_scalar:
+                    default = f' DEFAULT {column.default.arg!r}'
+                connection.execute(db.text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}'
+                ))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+# Columns written by the backfills and jobs below, recorded as
+# resource.updated events so replay reproduces them
+HOURS_COLUMNS = tuple(f'hours_{day}' for day in DAYS)
+RATING_COLUMNS = ('rating', 'total_ratings', 'decayed_sum', 'decayed_weight', 'decayed_at', 'recent_rating', 'score')
+
+# Rows per transaction when recompute_ratings ages scores
+AGEING_BATCH_SIZE = 500
+
+def backfill_rating_scores():
+    # Resources rated before decayed scores existed (including the seed
+    # data) start from their lifetime totals, aged from their creation time
+    now = datetime.utcnow()
+    resources = Resource.query.filter(
+        Resource.total_ratings > 0,
+        db.or_(Resource.decayed_at.is_(None), Resource.decayed_weight == 0)
+    ).all()
+    # Unrated resources score the prior mean, not zero
+    unrated = Resource.query.filter(
+        db.func.coalesce(Resource.total_ratings, 0) == 0,
+        db.func.coalesce(Resource.score, 0) != current_app.config['RATING_PRIOR_MEAN']
+    ).all()
+    for resource in resources + unrated:
+        resource.start_decayed_rating(now)
+        record(RESOURCE_UPDATED, resource, fields=RATING_COLUMNS)
+    db.session.commit()
+
+def backfill_opening_hours():
+    # The only hours recorded before structured hours existed were "24/7"
+    # mentions in descriptions
+    resources = Resource.query.filter(
+        Resource.hours_mon.is_(None),
+        Resource.description.ilike('%24/7%')
+    ).all()
+    for resource in resources:
+        resource.opening_hours = '24/7'
+        record(RESOURCE_UPDATED, resource, fields=HOURS_COLUMNS)
+    db.session.commit()
+
+def backfill_geocoding(batch_size=1000):
+    # Assign canonical city and locality to existing rows, in short
+    # id-ordered transactions
+    updated = 0
+    last_id = 0
+    while True:
+        batch = Resource.query.filter(Resource.id > last_id).order_by(Resource.id).limit(batch_size).all()
+        if not batch:
+            return updated
+        for resource in batch:
+            if geocode_resource(resource):
+                record(RESOURCE_UPDATED, resource, fields=('city', 'locality'))
+                updated += 1
+        last_id = batch[-1].id
+        db.session.commit()
+
+def backfill_derived_fields():
+    backfill_rating_scores()
+    backfill_opening_hours()
+    # City filters match canonical names, so alias-named rows must be
+    # normalised before they can be found
+    backfill_geocoding()
+
+# Background jobs (registered on the scheduler, run by jobs.py)
+@scheduler.task('recompute_ratings', every=3600)
+def recompute_ratings():
+    # Concurrent rate_resource calls can lose increments of the in-place
+    # average, so rebuild it from the Rating rows. Seeded resources whose
+    # totals predate the Rating table (more counted than stored) are skipped.
+    aggregates = db.session.query(
+        Rating.resource_id,
+        db.func.avg(Rating.rating),
+        db.func.count(Rating.id)
+    ).group_by(Rating.resource_id).all()
+
+    now = datetime.utcnow()
+    for resource_id, average, count in aggregates:
+        resource = db.session.get(Resource, resource_id)
+        if resource is None or count < resource.total_ratings:
+            continue
+        if resource.total_ratings != count or abs(resource.rating - average) > 1e-9:
+            resource.rating = 0.0
+            resource.total_ratings = 0
+            resource.decayed_sum = resource.decayed_weight = 0.0
+            resource.decayed_at = None
+            ratings = Rating.query.filter_by(resource_id=resource_id).order_by(Rating.created_at)
+            for rating in ratings:
+                resource.add_rating(rating.rating, now=rating.created_at)
+            record(RESOURCE_UPDATED, resource, fields=RATING_COLUMNS)
+    db.session.commit()
+
+    # Age every score to the present, so resources that stopped receiving
+    # ratings drift back towards the prior. Not logged: ageing depends only
+    # on time, and rebuilding the projections ages every resource to the
+    # present the same way. Short id-ordered batches keep each hold on the
+    # SQLite write lock brief.
+    last_id = 0
+    while True:
+        batch = Resource.query.filter(
+            Resource.decayed_weight > 0,
+            Resource.id > last_id
+        ).order_by(Resource.id).limit(AGEING_BATCH_SIZE).all()
+        if not batch:
+            break
+        for resource in batch:
+            resource.decay_to(now)
+            resource.update_scores()
+        last_id = batch[-1].id
+        db.session.commit()
+
+@scheduler.task('optimize_indexes', every=6 * 3600)
+def optimize_indexes():
+    # The spatial index is kept in sync by triggers, so only the planner
+    # statistics need refreshing
+    db.session.execute(db.text('ANALYZE'))
+
+@scheduler.task('vacuum', every=24 * 3600)
+def vacuum():
+    # VACUUM cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(db.text('VACUUM'))
+
+@scheduler.task('expire_unverified', every=24 * 3600)
+def expire_unverified():
+    # Disabled unless UNVERIFIED_TTL_DAYS is set. Anything with ratings or
+    # photos attached is kept: deleting it would orphan those rows
+    if current_app.config['UNVERIFIED_TTL_DAYS'] is None:
+        return
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['UNVERIFIED_TTL_DAYS'])
+    expired = Resource.query.filter(
+        Resource.is_verified.is_(False),
+        Resource.total_ratings == 0,
+        Resource.created_at < cutoff,
+        ~db.exists().where(Rating.resource_id == Resource.id),
+        ~db.exists().where(Photo.resource_id == Resource.id)
+    ).all()
+    for resource in expired:
+        record(RESOURCE_DELETED, resource)
+        db.session.delete(resource)
+
+@scheduler.task('snapshot_events', every=24 * 3600)
+def snapshot_events():
+    take_snapshot(min_events=current_app.config['EVENT_SNAPSHOT_INTERVAL'])
+    compact()
@@ -0,0 +1,235 @@
+from flask import current_app, url_for
+from datetime import datetime
+import math
+
+from extensions import db
+from geocode import canonical_city
+from hours import DAYS, current_slot, format_opening_hours, parse_opening_hours
+
+# Database Models
+class Resource(db.Model):
+    # Latitude index backs nearest search when SQLite has no R*Tree support
+    __table_args__ = (db.Index('ix_resource_lat_lng', 'latitude', 'longitude'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    resource_type = db.Column(db.String(20), nullable=False)  # 'water' or 'washroom'
+    address = db.Column(db.String(200))
+    city = db.Column(db.String(50))
+    locality = db.Column(db.String(100))  # assigned by reverse geocoding
+    is_verified = db.Column(db.Boolean, default=False)
+    rating = db.Column(db.Float, default=0.0)
+    total_ratings = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_by = db.Column(db.String(100))
+    # Exponentially decayed rating sums, maintained incrementally
+    decayed_sum = db.Column(db.Float, default=0.0)
+    decayed_weight = db.Column(db.Float, default=0.0)
+    decayed_at = db.Column(db.DateTime)
+    recent_rating = db.Column(db.Float, default=0.0, index=True)
+    score = db.Column(db.Float, default=0.0, index=True)
+    # Opening hours as one 48-bit half-hour mask per weekday (see hours.py);
+    # NULL means the hours are unknown
+    hours_mon = db.Column(db.Integer)
+    hours_tue = db.Column(db.Integer)
+    hours_wed = db.Column(db.Integer)
+    hours_thu = db.Column(db.Integer)
+    hours_fri = db.Column(db.Integer)
+    hours_sat = db.Column(db.Integer)
+    hours_sun = db.Column(db.Integer)
+
+    @property
+    def opening_hours(self):
+        masks = self.hours_masks()
+        return format_opening_hours(masks) if masks else None
+
+    @opening_hours.setter
+    def opening_hours(self, value):
+        masks = parse_opening_hours(value) if value else [None] * 7
+        for day, mask in zip(DAYS, masks):
+            setattr(self, f'hours_{day}', mask)
+
+    def hours_masks(self):
+        masks = [getattr(self, f'hours_{day}') for day in DAYS]
+        return None if all(mask is None for mask in masks) else [mask or 0 for mask in masks]
+
+    def is_open(self, now=None):
+        masks = self.hours_masks()
+        if masks is None:
+            return None
+        day, slot = current_slot(now)
+        return bool(masks[day] >> slot & 1)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'resource_type': self.resource_type,
+            'address': self.address,
+            'city': self.city,
+            'locality': self.locality,
+            'is_verified': self.is_verified,
+            'rating': self.rating,
+            'total_ratings': self.total_ratings,
+            'recent_rating': self.recent_rating,
+            'score': self.score,
+            'opening_hours': self.opening_hours,
+            'open_now': self.is_open(),
+            'created_at': self.created_at.isoformat(),
+            'submitted_by': self.submitted_by
+        }
+
+    def add_rating(self, stars, now=None):
+        # O(1) update of the lifetime average and the decayed scores
+        now = now or datetime.utcnow()
+        total = self.total_ratings or 0
+        self.rating = ((self.rating or 0.0) * total + stars) / (total + 1)
+        self.total_ratings = total + 1
+
+        self.decay_to(now)
+        self.decayed_sum += stars
+        self.decayed_weight += 1
+        self.update_scores()
+
+    def start_decayed_rating(self, now):
+        # Lifetime totals recorded without decayed sums (e.g. seed data)
+        # are treated as ratings given when the resource was created
+        self.decayed_sum = (self.rating or 0.0) * (self.total_ratings or 0)
+        self.decayed_weight = float(self.total_ratings or 0)
+        self.decayed_at = self.created_at or now
+        self.decay_to(now)
+        self.update_scores()
+
+    def decay_to(self, now):
+        # Both sums shrink by the same factor, so recent_rating is unchanged
+        # by the passage of time; only the score drifts back to the prior
+        if self.decayed_at is not None and now > self.decayed_at:
+            half_life = current_app.config['RATING_HALF_LIFE_DAYS'] * 86400
+            age = (now - self.decayed_at).total_seconds()
+            factor = math.exp(-math.log(2) * age / half_life)
+            self.decayed_sum = (self.decayed_sum or 0.0) * factor
+            self.decayed_weight = (self.decayed_weight or 0.0) * factor
+        self.decayed_sum = self.decayed_sum or 0.0
+        self.decayed_weight = self.decayed_weight or 0.0
+        self.decayed_at = now
+
+    def update_scores(self):
+        prior_mean = current_app.config['RATING_PRIOR_MEAN']
+        prior_weight = current_app.config['RATING_PRIOR_WEIGHT']
+        if self.decayed_weight > 0:
+            self.recent_rating = self.decayed_sum / self.decayed_weight
+        else:
+            self.recent_rating = 0.0
+        self.score = (prior_mean * prior_weight + self.decayed_sum) / (prior_weight + self.decayed_weight)
+
+class Rating(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_ip = db.Column(db.String(45))
+
+class Photo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), nullable=False, index=True)
+    rating_id = db.Column(db.Integer, db.ForeignKey('rating.id'))
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # content address on disk
+    content_type = db.Column(db.String(20), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_ip = db.Column(db.String(45))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'resource_id': self.resource_id,
+            'rating_id': self.rating_id,
+            'url': url_for('main.photo_file', digest=self.sha256),
+            'thumbnail_url': url_for('main.photo_file', digest=self.sha256, variant='thumb'),
+            'content_type': self.content_type,
+            'size': self.size,
+            'created_at': self.created_at.isoformat()
+        }
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    interval = db.Column(db.Integer, nullable=False)  # seconds between runs
+    next_run_at = db.Column(db.DateTime, nullable=False, index=True)
+    locked_until = db.Column(db.DateTime)
+    last_run_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(10))  # 'ok' or 'error'
+    last_error = db.Column(db.Text)
+    last_duration = db.Column(db.Float)
+    run_count = db.Column(db.Integer, default=0)
+
+class Event(db.Model):
+    # Append-only log of every write; see events.py. AUTOINCREMENT keeps ids
+    # from being reused once compaction has emptied the table, since replay
+    # only reads events after the latest snapshot's id.
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)  # global sequence number
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    type = db.Column(db.String(30), nullable=False, index=True)  # e.g. 'rating.created'
+    resource_id = db.Column(db.Integer, index=True)
+    payload = db.Column(db.Text, nullable=False)  # compact JSON
+
+class Snapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False)  # events up to here are included
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    event_count = db.Column(db.Integer, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON projection state
+
+# Orderings accepted by the `sort` query parameter; all are indexed columns
+SORT_ORDERS = {
+    'rating': Resource.rating.desc(),
+    'recent': Resource.recent_rating.desc(),
+    'score': Resource.score.desc(),
+    'newest': Resource.created_at.desc()
+}
+
+def open_now_filter(now=None):
+    # Bitwise test on today's hours column, evaluated by SQLite
+    day, slot = current_slot(now)
+    return getattr(Resource, f'hours_{DAYS[day]}').op('&')(1 << slot) != 0
+
+def filter_resources(query, args, search=False):
+    # Applies the read API's query parameters to a Resource.query or a
+    # select(); shared by the Flask routes and the ASGI read API in asgi.py
+    resource_type = args.get('type', 'all')
+    city = args.get('city', 'all')
+    sort = args.get('sort')
+    open_now = args.get('open_now') == 'true'
+    
+    if resource_type != 'all':
+        query = query.filter(Resource.resource_type == resource_type)
+    
+    if city != 'all':
+        query = query.filter(Resource.city == canonical_city(city))
+    
+    if open_now:
+        query = query.filter(open_now_filter())
+    
+    text = args.get('q', '').lower() if search else ''
+    if text:
+        query = query.filter(
+            db.or_(
+                Resource.name.ilike(f'%{text}%'),
+                Resource.description.ilike(f'%{text}%'),
+                Resource.address.ilike(f'%{text}%')
+            )
+        )
+    
+    if sort in SORT_ORDERS:
+        query = query.order_by(SORT_ORDERS[sort], Resource.id)
+    
+    return query
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed photo storage
+#
+# Uploads are streamed to a temporary file in fixed-size chunks while being
+# hashed, then moved to <PHOTO_DIR>/<aa>/<bb>/<sha256>. Identical photos are
+# therefore stored once, and a file never changes once written, which lets
+# them be served with immutable cache headers. Thumbnails are produced in a
+# small thread pool after the upload request has returned.
+
+# Leading bytes of the image formats we accept
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'RIFF', 'image/webp')
+)
+
+
+class PhotoError(ValueError):
+    pass
+
+
+def sniff_content_type(head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            if content_type == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return content_type
+    return None
+
+
+class PhotoStore:
+    def __init__(self, app=None):
+        self.root = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PHOTO_DIR', os.path.join(app.instance_path, 'photos'))
+        app.config.setdefault('PHOTO_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('PHOTO_CHUNK_SIZE', 64 * 1024)
+        app.config.setdefault('PHOTO_THUMBNAIL_SIZE', 320)
+        app.config.setdefault('PHOTO_WORKERS', 2)
+
+        self.root = app.config['PHOTO_DIR']
+        self.max_bytes = app.config['PHOTO_MAX_BYTES']
+        self.chunk_size = app.config['PHOTO_CHUNK_SIZE']
+        self.thumbnail_size = app.config['PHOTO_THUMBNAIL_SIZE']
+        self.workers = app.config['PHOTO_WORKERS']
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hydrafind-thumbs')
+        return self._executor
+
+    def path_for(self, digest, thumbnail=False):
+        name = f'{digest}.thumb.jpg' if thumbnail else digest
+        return os.path.join(self.root, digest[:2], digest[2:4], name)
+
+    def save_stream(self, stream):
+        """Stream an upload to disk. Returns (sha256, size, content_type)."""
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        sha256 = hashlib.sha256()
+        size = 0
+        content_type = None
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if content_type is None:
+                        content_type = sniff_content_type(chunk)
+                        if content_type is None:
+                            raise PhotoError('Only JPEG, PNG and WebP photos are supported')
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise PhotoError(f'Photos must be smaller than {self.max_bytes // (1024 * 1024)} MB')
+                    sha256.update(chunk)
+                    tmp.write(chunk)
+
+            if size == 0:
+                raise PhotoError('No photo was uploaded')
+
+            digest = sha256.hexdigest()
+            path = self.path_for(digest)
+            if os.path.exists(path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            return digest, size, content_type
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def submit_thumbnail(self, digest):
+        if not os.path.exists(self.path_for(digest, thumbnail=True)):
+            self.executor.submit(self._make_thumbnail, digest)
+
+    def _make_thumbnail(self, digest):
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            logger.warning('Pillow is not installed; skipping thumbnail for %s', digest)
+            return
+
+        target = self.path_for(digest, thumbnail=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        os.close(fd)
+        try:
+            with Image.open(self.path_for(digest)) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                image.convert('RGB').save(tmp_path, 'JPEG', quality=80, optimize=True)
+            os.replace(tmp_path, target)
+        except Exception:
+            logger.exception('Could not create thumbnail for %s', digest)
+            os.unlink(tmp_path)
@@ -0,0 +1,178 @@
+import ipaddress
+import threading
+import time
+
+from flask import current_app, request, jsonify
+
+# Sliding-window rate limiting
+#
+# Each (client, endpoint) key keeps only the hit counts of the current and the
+# previous fixed window. The request rate is estimated by weighting the
+# previous window by how much of it still overlaps the sliding window, which
+# gives a smooth limit at a constant 3 integers per key.
+#
+# A hit is counted and read back in one atomic step, then undone if it is
+# over the limit, so concurrent requests can't all pass on the same reading.
+
+UNITS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+
+def client_key(address):
+    """Rate-limit key for a client address: IPv6 clients are grouped by /64."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except (TypeError, ValueError):
+        return str(address)
+    if ip.version == 6:
+        if ip.ipv4_mapped is not None:
+            return str(ip.ipv4_mapped)
+        return str(ipaddress.ip_network(f'{ip}/64', strict=False))
+    return str(ip)
+
+
+def parse_limit(value):
+    """Parse a limit such as '10/minute' into (count, window_seconds)."""
+    count, _, unit = value.partition('/')
+    unit = unit.strip().rstrip('s')
+    if unit not in UNITS:
+        raise ValueError(f'Unknown rate limit unit: {value}')
+    return int(count), UNITS[unit]
+
+
+class MemoryStorage:
+    """Process-local counters, stored as [window_index, previous, current]."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, index, ttl):
+        """Count a hit in window `index`; returns (previous, current) counts."""
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                if len(self._counters) >= self.max_keys:
+                    self._evict(index)
+                entry = self._counters[key] = [index, 0, 1]
+            elif entry[0] == index:
+                entry[2] += 1
+            elif entry[0] == index - 1:
+                entry[0], entry[1], entry[2] = index, entry[2], 1
+            else:
+                entry[0], entry[1], entry[2] = index, 0, 1
+            return entry[1], entry[2]
+
+    def decr(self, key, index):
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is not None and entry[0] == index and entry[2] > 0:
+                entry[2] -= 1
+
+    def _evict(self, index):
+        # Drop keys whose counters can no longer affect the sliding window
+        stale = [key for key, entry in self._counters.items() if entry[0] < index - 1]
+        for key in stale:
+            del self._counters[key]
+        if len(self._counters) >= self.max_keys:
+            # Still full of live keys: drop the least active half, so a flood
+            # of new clients can't reset the counters of busy ones
+            by_activity = sorted(self._counters, key=lambda key: sum(self._counters[key][1:]))
+            for key in by_activity[:len(by_activity) // 2]:
+                del self._counters[key]
+
+
+class RedisStorage:
+    """Shared counters for multi-worker deployments, using any redis-py client."""
+
+    def __init__(self, client, prefix='hydrafind:rl:'):
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key, index, ttl):
+        name = f'{self.prefix}{key}:{index}'
+        # MULTI/EXEC, so the read of the previous window and the increment
+        # are applied atomically with respect to other workers
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(f'{self.prefix}{key}:{index - 1}')
+        pipe.incr(name)
+        pipe.expire(name, ttl)
+        previous, current, _ = pipe.execute()
+        return int(previous or 0), int(current)
+
+    def decr(self, key, index):
+        self.client.decr(f'{self.prefix}{key}:{index}')
+
+
+class RateLimiter:
+    def __init__(self, app=None, storage=None):
+        self._storage = storage
+        self.storage = storage or MemoryStorage()
+        self.limits = {}
+        self.default_limit = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_DEFAULT', '120/minute')
+        app.config.setdefault('RATELIMITS', {})
+        app.config.setdefault('RATELIMIT_STORAGE_URL', None)
+
+        if app.config['RATELIMIT_STORAGE_URL']:
+            # Shared counters, so the limit holds across all workers
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError('RATELIMIT_STORAGE_URL requires the redis package (pip install redis)')
+            self.storage = RedisStorage(redis.Redis.from_url(app.config['RATELIMIT_STORAGE_URL']))
+        elif self._storage is None:
+            self.storage = MemoryStorage()
+
+        self.default_limit = parse_limit(app.config['RATELIMIT_DEFAULT'])
+        self.limits = {
+            endpoint: parse_limit(limit)
+            for endpoint, limit in app.config['RATELIMITS'].items()
+        }
+        app.before_request(self._check_request)
+
+    def hit(self, key, limit, window, now=None):
+        """Record a hit for key. Returns the seconds to wait, or 0 if allowed."""
+        now = time.time() if now is None else now
+        index = int(now // window)
+        elapsed = (now % window) / window
+
+        previous, current = self.storage.incr(key, index, window * 2)
+        if previous * (1 - elapsed) + current > limit:
+            # Rejected hits don't count against the client
+            self.storage.decr(key, index)
+            # Wait until enough of the previous window has slid out
+            if current > limit or previous == 0:
+                return window - (now % window)
+            needed = (previous * (1 - elapsed) + current - limit) / previous
+            return max(needed * window, 1)
+        return 0
+
+    def _check_request(self):
+        if not current_app.config['RATELIMIT_ENABLED']:
+            return None
+        endpoint = request.endpoint
+        if endpoint is None or endpoint == 'static':
+            return None
+
+        limit, window = self.limits.get(endpoint, self.default_limit)
+        retry_after = self.hit(f'{client_key(request.remote_addr)}:{endpoint}', limit, window)
+        if retry_after:
+            response = jsonify({
+                'success': False,
+                'message': 'Too many requests, please slow down and try again shortly'
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(int(retry_after + 0.999))
+            return response
+        return None
@@ -0,0 +1,191 @@
+from datetime import datetime
+
+from events import RESOURCE_CREATED, record
+from extensions import db
+from geocode import geocode_resource
+from models import Resource
+
+
+def indian_resources():
+    # Sample data for the supported Indian cities
+    return [
+        # Delhi
+        Resource(
+            name="India Gate Water Fountain",
+            description="Public water fountain near India Gate, available 24/7",
+            latitude=28.6129,
+            longitude=77.2295,
+            resource_type="water",
+            address="India Gate, New Delhi",
+            city="Delhi",
+            is_verified=True,
+            rating=4.2,
+            total_ratings=25,
+            opening_hours="24/7",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="Connaught Place Public Restroom",
+            description="Clean public restrooms in CP, wheelchair accessible",
+            latitude=28.6315,
+            longitude=77.2167,
+            resource_type="washroom",
+            address="Connaught Place, New Delhi",
+            city="Delhi",
+            is_verified=True,
+            rating=3.8,
+            total_ratings=18,
+            opening_hours="06:00-22:00",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="Red Fort Water Station",
+            description="Free water refill station near Red Fort entrance",
+            latitude=28.6562,
+            longitude=77.2410,
+            resource_type="water",
+            address="Red Fort, Delhi",
+            city="Delhi",
+            is_verified=True,
+            rating=4.0,
+            total_ratings=12,
+            opening_hours={"daily": "09:30-18:00", "mon": "closed"},
+            submitted_by="Admin"
+        ),
+
+        # Mumbai
+        Resource(
+            name="Gateway of India Water Point",
+            description="Public water fountain at Gateway of India",
+            latitude=18.9220,
+            longitude=72.8347,
+            resource_type="water",
+            address="Gateway of India, Mumbai",
+            city="Mumbai",
+            is_verified=True,
+            rating=4.1,
+            total_ratings=30,
+            opening_hours="24/7",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="Marine Drive Public Facilities",
+            description="Clean restrooms along Marine Drive",
+            latitude=18.9434,
+            longitude=72.8234,
+            resource_type="washroom",
+            address="Marine Drive, Mumbai",
+            city="Mumbai",
+            is_verified=True,
+            rating=4.3,
+            total_ratings=22,
+            opening_hours="06:00-23:00",
+            submitted_by="Admin"
+        ),
+
+        # Bengaluru
+        Resource(
+            name="Cubbon Park Water Fountain",
+            description="Multiple water fountains throughout Cubbon Park",
+            latitude=12.9716,
+            longitude=77.5946,
+            resource_type="water",
+            address="Cubbon Park, Bengaluru",
+            city="Bengaluru",
+            is_verified=True,
+            rating=4.4,
+            total_ratings=35,
+            opening_hours="06:00-18:00",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="MG Road Metro Station Facilities",
+            description="Modern restrooms at MG Road Metro Station",
+            latitude=12.9759,
+            longitude=77.6069,
+            resource_type="washroom",
+            address="MG Road Metro Station, Bengaluru",
+            city="Bengaluru",
+            is_verified=True,
+            rating=4.5,
+            total_ratings=28,
+            opening_hours="05:00-23:00",
+            submitted_by="Admin"
+        ),
+
+        # Hyderabad
+        Resource(
+            name="Charminar Water Station",
+            description="Public water facility near Charminar",
+            latitude=17.3616,
+            longitude=78.4747,
+            resource_type="water",
+            address="Charminar, Hyderabad",
+            city="Hyderabad",
+            is_verified=True,
+            rating=3.9,
+            total_ratings=20,
+            opening_hours="09:00-17:30",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="Hussain Sagar Lake Restrooms",
+            description="Public facilities near Hussain Sagar Lake",
+            latitude=17.4239,
+            longitude=78.4738,
+            resource_type="washroom",
+            address="Hussain Sagar, Hyderabad",
+            city="Hyderabad",
+            is_verified=True,
+            rating=4.0,
+            total_ratings=15,
+            opening_hours="06:00-22:00",
+            submitted_by="Admin"
+        ),
+
+        # Lucknow
+        Resource(
+            name="Bara Imambara Water Point",
+            description="Water facility at Bara Imambara complex",
+            latitude=26.8695,
+            longitude=80.9124,
+            resource_type="water",
+            address="Bara Imambara, Lucknow",
+            city="Lucknow",
+            is_verified=True,
+            rating=3.7,
+            total_ratings=14,
+            opening_hours="06:00-17:00",
+            submitted_by="Admin"
+        ),
+        Resource(
+            name="Hazratganj Public Restroom",
+            description="Clean public restrooms in Hazratganj market area",
+            latitude=26.8467,
+            longitude=80.9462,
+            resource_type="washroom",
+            address="Hazratganj, Lucknow",
+            city="Lucknow",
+            is_verified=True,
+            rating=3.6,
+            total_ratings=11,
+            opening_hours="08:00-22:00",
+            submitted_by="Admin"
+        )
+    ]
+
+
+def seed_database():
+    # Idempotent: only resources whose name isn't in the database yet are added
+    existing = {name for (name,) in db.session.query(Resource.name)}
+    added = [resource for resource in indian_resources() if resource.name not in existing]
+    db.session.add_all(added)
+    db.session.flush()
+    
+    now = datetime.utcnow()
+    for resource in added:
+        geocode_resource(resource)
+        resource.start_decayed_rating(now)
+        record(RESOURCE_CREATED, resource)
+    db.session.commit()
+    return len(added)
@@ -0,0 +1,121 @@
+import logging
+import math
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, inspect
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Resource
+
+logger = logging.getLogger(__name__)
+
+# Spatial index and nearest-resource search
+#
+# Resource coordinates are mirrored into an SQLite R*Tree virtual table by
+# triggers, so every writer (Flask, ASGI, bulk deletes) keeps it in sync.
+# Nearest-k queries probe a bounding box that doubles in size until it holds
+# k resources within its inscribed circle, so the work done is proportional to
+# the results found rather than to the size of the table.
+
+EARTH_RADIUS_KM = 6371.0
+START_RADIUS_KM = 1.0
+MAX_RADIUS_KM = 3000.0  # covers all of India from anywhere in it
+
+# Kept out of db.metadata so create_all() doesn't try to create it as a table
+rtree = Table(
+    'resource_rtree', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('min_lat', Float),
+    Column('max_lat', Float),
+    Column('min_lng', Float),
+    Column('max_lng', Float)
+)
+
+_rtree_available = {}
+
+RTREE_DDL = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS resource_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+    '''CREATE TRIGGER IF NOT EXISTS resource_rtree_insert AFTER INSERT ON resource BEGIN
+        INSERT OR REPLACE INTO resource_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS resource_rtree_update AFTER UPDATE OF latitude, longitude ON resource BEGIN
+        INSERT OR REPLACE INTO resource_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS resource_rtree_delete AFTER DELETE ON resource BEGIN
+        DELETE FROM resource_rtree WHERE id = old.id;
+    END'''
+]
+
+
+def ensure_spatial_index():
+    """Create the R*Tree table and its triggers. Returns False if SQLite lacks R*Tree."""
+    try:
+        with db.engine.begin() as connection:
+            for statement in RTREE_DDL:
+                connection.execute(db.text(statement))
+    except OperationalError:
+        logger.warning('SQLite was built without R*Tree support; nearest search will scan by latitude')
+        return False
+    rebuild_spatial_index()
+    _rtree_available[db.engine] = True
+    return True
+
+
+def rebuild_spatial_index():
+    with db.engine.begin() as connection:
+        connection.execute(db.text('DELETE FROM resource_rtree'))
+        connection.execute(db.text(
+            'INSERT INTO resource_rtree SELECT id, latitude, latitude, longitude, longitude FROM resource'
+        ))
+
+
+def has_spatial_index():
+    # Checked once per engine; `flask migrate` creates the index
+    engine = db.engine
+    if engine not in _rtree_available:
+        _rtree_available[engine] = inspect(engine).has_table('resource_rtree')
+    return _rtree_available[engine]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat, lng, radius_km):
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 0.01)))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def nearest_resources(query, lat, lng, k):
+    """Return up to k (resource, distance_km) pairs from `query`, nearest first.
+
+    `query` is a Resource.query with any non-spatial filters already applied.
+    """
+    use_rtree = has_spatial_index()
+    radius = START_RADIUS_KM
+    while True:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        if use_rtree:
+            candidates = query.join(rtree, rtree.c.id == Resource.id).filter(
+                rtree.c.max_lat >= min_lat, rtree.c.min_lat <= max_lat,
+                rtree.c.max_lng >= min_lng, rtree.c.min_lng <= max_lng
+            )
+        else:
+            candidates = query.filter(
+                Resource.latitude.between(min_lat, max_lat),
+                Resource.longitude.between(min_lng, max_lng)
+            )
+
+        found = sorted(
+            ((resource, haversine_km(lat, lng, resource.latitude, resource.longitude)) for resource in candidates),
+            key=lambda pair: pair[1]
+        )
+        # Only results inside the inscribed circle are guaranteed to be the
+        # nearest; anything in the box corners may be beaten by the next ring
+        within = [pair for pair in found if pair[1] <= radius]
+        if len(within) >= k or radius >= MAX_RADIUS_KM:
+            return (within if radius < MAX_RADIUS_KM else found)[:k]
+        radius *= 2
@@ -0,0 +1,25 @@
+import pytest
+
+from app import create_app, migrate
+from extensions import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "hydrafind.db"}',
+        'PHOTO_DIR': str(tmp_path / 'photos'),
+        'SCHEDULER_ENABLED': False,
+        'RATELIMIT_ENABLED': False
+    })
+    with app.app_context():
+        migrate()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import migrate
+from events import RESOURCE_UPDATED, compact, load_projection, take_snapshot, to_payload
+from extensions import db
+from maintenance import RATING_COLUMNS, expire_unverified
+from models import Event, Photo, Rating, Resource, Snapshot
+
+
+def tables():
+    return (
+        {resource.id: to_payload(resource) for resource in Resource.query},
+        {rating.id: to_payload(rating) for rating in Rating.query},
+        {photo.id: to_payload(photo) for photo in Photo.query}
+    )
+
+
+def projected(projection):
+    return (
+        {id: to_payload(resource) for id, resource in projection.resources.items()},
+        projection.ratings,
+        projection.photos
+    )
+
+
+def add_resource(client, name, **fields):
+    response = client.post('/api/resources', json={
+        'name': name,
+        'latitude': 28.6139,
+        'longitude': 77.2090,
+        'resource_type': 'water',
+        'city': 'Delhi',
+        **fields
+    })
+    assert response.json['success'], response.json
+    return response.json['resource']['id']
+
+
+def rate(client, resource_id, stars, ip):
+    response = client.post(
+        f'/api/resources/{resource_id}/rate', json={'rating': stars}, environ_base={'REMOTE_ADDR': ip}
+    )
+    assert response.json['success'], response.json
+
+
+@pytest.fixture
+def legacy(app):
+    # Rows written before the event log existed, as the seed data was
+    db.session.add_all([
+        Resource(name='Old tap', latitude=19.076, longitude=72.8777, resource_type='water',
+                 city='Bombay', rating=4.2, total_ratings=10, created_at=datetime(2024, 1, 1)),
+        Resource(name='Old washroom', latitude=28.6315, longitude=77.2167, resource_type='washroom',
+                 city='Delhi', description='Open 24/7', created_at=datetime(2024, 2, 1))
+    ])
+    db.session.commit()
+    migrate()
+
+
+def test_migrate_takes_baseline_before_logging_backfills(legacy):
+    snapshot = Snapshot.query.one()
+    assert snapshot.last_event_id == 0
+
+    updated = Event.query.filter_by(type=RESOURCE_UPDATED).all()
+    assert sorted({event.resource_id for event in updated}) == [1, 2]
+    assert any(set(RATING_COLUMNS) <= set(json.loads(event.payload)) for event in updated)
+    assert Resource.query.filter_by(name='Old tap').one().city == 'Mumbai'
+
+
+def test_replay_matches_tables(legacy, client):
+    new_id = add_resource(client, 'New tap')
+    rate(client, 1, 5, '10.0.0.1')
+    rate(client, 1, 2, '10.0.0.2')
+    rate(client, new_id, 4, '10.0.0.1')
+    migrate()  # backfills are no-ops now, but must not disturb the log
+
+    assert projected(load_projection()) == tables()
+
+
+def test_replay_rebuild_restores_tables(app, legacy, client):
+    new_id = add_resource(client, 'New tap')
+    rate(client, new_id, 3, '10.0.0.1')
+    before = tables()
+
+    # Lose some writes behind the log's back; rebuilding restores them
+    Rating.query.delete()
+    Resource.query.filter_by(id=new_id).delete()
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['events', 'replay', '--rebuild'], input='y\n')
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    after = tables()
+
+    assert after[1:] == before[1:]
+    assert after[0].keys() == before[0].keys()
+    for id, resource in after[0].items():
+        # Rebuilding ages the decayed rating sums to the present
+        for name, value in resource.items():
+            if name == 'decayed_at':
+                continue
+            expected = before[0][id][name]
+            assert value == (pytest.approx(expected, rel=1e-6) if isinstance(value, float) else expected), name
+
+
+def test_replay_applies_deletes(app, legacy, client):
+    add_resource(client, 'Unverified tap')
+    Resource.query.filter_by(name='Unverified tap').update({'created_at': datetime(2020, 1, 1)})
+    db.session.commit()
+    app.config['UNVERIFIED_TTL_DAYS'] = 30
+
+    expire_unverified()
+    db.session.commit()
+
+    assert Resource.query.filter_by(name='Unverified tap').first() is None
+    assert projected(load_projection()) == tables()
+
+
+def test_compaction_keeps_ids_increasing(app, legacy, client):
+    rate(client, 1, 5, '10.0.0.1')
+    snapshot = take_snapshot()
+    app.config['EVENT_RETENTION_DAYS'] = 0
+
+    assert compact() > 0
+    assert Event.query.count() == 0
+
+    # AUTOINCREMENT never hands out ids the snapshot already covers, so the
+    # new events are replayed on top of it
+    new_id = add_resource(client, 'After compaction')
+    rate(client, new_id, 4, '10.0.0.1')
+    assert db.session.query(db.func.min(Event.id)).scalar() > snapshot.last_event_id
+
+    projection = load_projection()
+    assert projected(projection) == tables()
+    assert projection.event_count == snapshot.event_count + 2
+
+    # Compacting again works from the newest snapshot
+    newer = take_snapshot()
+    assert newer.last_event_id > snapshot.last_event_id
+    assert projected(load_projection()) == tables()
+
+
+def test_compaction_respects_retention(app, legacy):
+    snapshot = take_snapshot()
+    assert compact() == 0  # default retention keeps recent events
+    assert Event.query.count() > 0
+
+    Event.query.update({'created_at': datetime.utcnow() - timedelta(days=app.config['EVENT_RETENTION_DAYS'] + 1)})
+    db.session.commit()
+    assert compact() == snapshot.last_event_id
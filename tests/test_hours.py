@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from hours import DAYS, FULL_DAY, current_slot, format_opening_hours, parse_opening_hours
+
+
+def test_daily_range():
+    assert format_opening_hours(parse_opening_hours('06:00-22:00')) == {day: '06:00-22:00' for day in DAYS}
+
+
+def test_always_open():
+    assert parse_opening_hours('24/7') == [FULL_DAY] * 7
+    assert format_opening_hours([FULL_DAY] * 7)['sun'] == '00:00-24:00'
+
+
+@pytest.mark.parametrize('value', [
+    '06:00-22:00',
+    '24/7',
+    {'daily': '08:00-12:00, 14:00-18:30', 'sun': 'closed'},
+    {'mon': '09:00-17:00', 'sat': '10:00-14:00'},
+    {'fri': '20:00-02:00', 'sat': 'closed'}
+])
+def test_format_round_trips(value):
+    masks = parse_opening_hours(value)
+    assert parse_opening_hours(format_opening_hours(masks)) == masks
+
+
+def test_overnight_range_continues_into_next_day():
+    hours = format_opening_hours(parse_opening_hours({'fri': '20:00-02:00'}))
+    assert hours['fri'] == '20:00-24:00'
+    assert hours['sat'] == '00:00-02:00'
+    assert hours['thu'] == 'closed'
+
+
+def test_overnight_range_wraps_from_sunday_to_monday():
+    hours = format_opening_hours(parse_opening_hours('22:00-06:00'))
+    assert hours['mon'] == '00:00-06:00, 22:00-24:00'
+
+
+def test_closed_day_keeps_previous_nights_spill():
+    hours = format_opening_hours(parse_opening_hours({'daily': '18:00-01:00', 'sat': 'closed'}))
+    assert hours['sat'] == '00:00-01:00'
+    assert hours['sun'] == '18:00-24:00'
+
+
+def test_named_days_override_daily_in_any_key_order():
+    first = parse_opening_hours({'daily': '09:00-17:00', 'sun': 'closed'})
+    second = parse_opening_hours({'sun': 'closed', 'daily': '09:00-17:00'})
+    assert first == second
+    assert format_opening_hours(first)['sun'] == 'closed'
+
+
+def test_only_whole_slots_count_as_open():
+    assert format_opening_hours(parse_opening_hours('09:15-10:45'))['mon'] == '09:30-10:30'
+
+
+@pytest.mark.parametrize('value', [
+    42,
+    {'mon': 9},
+    {'someday': '09:00-17:00'},
+    '09:00',
+    '25:00-26:00',
+    '24:30-01:00'
+])
+def test_invalid_opening_hours(value):
+    with pytest.raises(ValueError):
+        parse_opening_hours(value)
+
+
+def test_current_slot_uses_indian_time():
+    # 20:15 UTC on a Sunday is 01:45 on Monday in India
+    assert current_slot(datetime(2025, 6, 1, 20, 15, tzinfo=timezone.utc)) == (0, 3)
@@ -0,0 +1,64 @@
+from extensions import limiter
+from ratelimit import MemoryStorage, RateLimiter, client_key, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit('10/minute') == (10, 60)
+    assert parse_limit('2/hours') == (2, 3600)
+
+
+def test_client_key_groups_ipv6_by_64():
+    assert client_key('2001:db8:1:2:3:4:5:6') == client_key('2001:db8:1:2:ffff::1') == '2001:db8:1:2::/64'
+    assert client_key('::ffff:203.0.113.7') == '203.0.113.7'
+    assert client_key('203.0.113.7') == '203.0.113.7'
+
+
+def test_hit_rejects_over_limit_until_window_ends():
+    limiter = RateLimiter(storage=MemoryStorage())
+    assert [limiter.hit('k', 3, 60, now=t) for t in (0, 1, 2)] == [0, 0, 0]
+    # With no previous window, the client waits for the current one to end
+    assert limiter.hit('k', 3, 60, now=3) == 57
+    assert limiter.hit('k', 3, 60, now=30) == 30
+
+
+def test_retry_after_waits_for_previous_window_to_slide_out():
+    limiter = RateLimiter(storage=MemoryStorage())
+    for t in range(10):
+        assert limiter.hit('k', 10, 60, now=t) == 0
+
+    # At the start of the next window all 10 previous hits still count:
+    # one more is over by 1, and each 6 s slides one previous hit out
+    assert limiter.hit('k', 10, 60, now=60) == 6
+    # The rejected hit wasn't counted, so the client is let in once it waits
+    assert limiter.hit('k', 10, 60, now=66) == 0
+    assert limiter.hit('k', 10, 60, now=66) > 0
+
+
+def test_hit_forgets_old_windows():
+    limiter = RateLimiter(storage=MemoryStorage())
+    for t in range(5):
+        limiter.hit('k', 5, 60, now=t)
+    assert limiter.hit('k', 5, 60, now=5) > 0
+    assert limiter.hit('k', 5, 60, now=200) == 0
+
+
+def test_memory_storage_evicts_least_active_keys():
+    storage = MemoryStorage(max_keys=4)
+    for _ in range(5):
+        storage.incr('busy', 0, 120)
+    for key in ('a', 'b', 'c'):
+        storage.incr(key, 0, 120)
+    storage.incr('new', 0, 120)
+    assert storage.incr('busy', 0, 120) == (0, 6)
+
+
+def test_requests_over_limit_get_429_with_retry_after(app, client):
+    app.config['RATELIMIT_ENABLED'] = True
+    limiter.limits['main.get_cities'] = (2, 60)
+
+    assert client.get('/api/cities').status_code == 200
+    assert client.get('/api/cities').status_code == 200
+    response = client.get('/api/cities')
+    assert response.status_code == 429
+    assert response.json['success'] is False
+    assert 1 <= int(response.headers['Retry-After']) <= 60
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import spatial
+from extensions import db
+from models import Resource
+from spatial import haversine_km, has_spatial_index, nearest_resources
+
+
+@pytest.fixture(params=['rtree', 'scan'])
+def resources(request, app):
+    if request.param == 'scan':
+        # As if SQLite had been built without R*Tree
+        spatial._rtree_available[db.engine] = False
+    assert has_spatial_index() == (request.param == 'rtree')
+
+    rng = random.Random(7)
+    for i in range(300):
+        # Mostly around central Delhi, with a few much farther away
+        spread = 0.05 if i % 10 else 2.0
+        db.session.add(Resource(
+            name=f'Resource {i}',
+            latitude=28.61 + rng.uniform(-spread, spread),
+            longitude=77.21 + rng.uniform(-spread, spread),
+            resource_type='water' if i % 3 else 'washroom',
+            city='Delhi'
+        ))
+    db.session.commit()
+    return Resource.query.all()
+
+
+def brute_force(resources, lat, lng, k, resource_type=None):
+    matches = [r for r in resources if resource_type in (None, r.resource_type)]
+    return sorted(matches, key=lambda r: haversine_km(lat, lng, r.latitude, r.longitude))[:k]
+
+
+@pytest.mark.parametrize('lat, lng, k', [
+    (28.61, 77.21, 1),
+    (28.61, 77.21, 10),
+    (28.70, 77.10, 25),
+    (27.00, 75.00, 3),  # nothing within the first few rings
+    (28.61, 77.21, 500)  # more than there are
+])
+def test_nearest_matches_brute_force(resources, lat, lng, k):
+    found = nearest_resources(Resource.query, lat, lng, k)
+    assert [r.id for r, _ in found] == [r.id for r in brute_force(resources, lat, lng, k)]
+    distances = [distance for _, distance in found]
+    assert distances == sorted(distances)
+
+
+def test_nearest_applies_query_filters(resources):
+    found = nearest_resources(Resource.query.filter_by(resource_type='washroom'), 28.61, 77.21, 5)
+    assert [r.id for r, _ in found] == [r.id for r in brute_force(resources, 28.61, 77.21, 5, 'washroom')]
+
+
+def test_nearest_follows_moved_and_deleted_resources(resources):
+    nearest, _ = nearest_resources(Resource.query, 28.61, 77.21, 1)[0]
+    db.session.delete(nearest)
+    moved = Resource.query.filter(Resource.id != nearest.id).first()
+    moved.latitude, moved.longitude = 28.61, 77.21
+    db.session.commit()
+
+    assert nearest_resources(Resource.query, 28.61, 77.21, 1)[0][0].id == moved.id
+
+
+def test_nearest_endpoint(resources, client):
+    response = client.get('/api/resources?lat=28.61&lng=77.21&k=5&type=water')
+    assert response.status_code == 200
+    results = response.json
+    assert len(results) == 5
+    assert all(result['resource_type'] == 'water' for result in results)
+    assert [result['distance_km'] for result in results] == sorted(result['distance_km'] for result in results)
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+from app import IMPORT_TIME_BUDGET_MS
+
+
+def test_import_time_is_within_budget(app):
+    result = app.test_cli_runner().invoke(args=['check-import-time'])
+    assert result.exit_code == 0, result.output
+    assert f'total (budget {IMPORT_TIME_BUDGET_MS} ms)' in result.output
+
+
+def test_building_the_app_defers_heavy_imports():
+    # numpy is only needed for coverage maps, and the default app is only
+    # built when `app.app` is first accessed
+    code = (
+        'import sys, app; app.create_app(); '
+        'print("numpy" in sys.modules, "app" in vars(sys.modules["app"]))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    assert result.stdout.split() == ['False', 'False']
@@ -0,0 +1,328 @@
+from flask import Blueprint, current_app, render_template, request, jsonify, send_file
+from datetime import datetime
+import math
+import os
+
+from coverage_map import MAX_DISTANCE_KM, RESOLUTIONS_M, RESOURCE_TYPES, CoverageError, get_coverage
+from events import PHOTO_CREATED, RATING_CREATED, RESOURCE_CREATED, record
+from extensions import db, photo_store
+from geocode import canonical_city, city_boundary, geocode_resource
+from models import Resource, Rating, Photo, filter_resources
+from photos import PhotoError, sniff_content_type
+from spatial import nearest_resources
+
+bp = Blueprint('main', __name__)
+
+# Routes
+@bp.route('/')
+def index():
+    return render_template('index.html')
+
+@bp.route('/api/resources')
+def get_resources():
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is not None and lng is not None:
+        if not (math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({
+                'success': False,
+                'message': 'lat and lng must be valid coordinates'
+            }), 400
+        return nearest(lat, lng)
+    
+    query = filter_resources(Resource.query, request.args)
+    resources = query.all()
+    return jsonify([resource.to_dict() for resource in resources])
+
+def nearest(lat, lng):
+    # Search outwards from the user's position regardless of the city
+    # label; results come back nearest first
+    k = max(1, min(request.args.get('k', 20, type=int), 100))
+    args = {key: value for key, value in request.args.items() if key not in ('city', 'sort')}
+    query = filter_resources(Resource.query, args)
+    
+    results = []
+    for resource, distance in nearest_resources(query, lat, lng, k):
+        data = resource.to_dict()
+        data['distance_km'] = round(distance, 3)
+        results.append(data)
+    return jsonify(results)
+
+@bp.route('/api/resources', methods=['POST'])
+def add_resource():
+    data = request.get_json()
+    
+    try:
+        resource = Resource(
+            name=data['name'],
+            description=data.get('description', ''),
+            latitude=float(data['latitude']),
+            longitude=float(data['longitude']),
+            resource_type=data['resource_type'],
+            address=data.get('address', ''),
+            city=data.get('city', ''),
+            opening_hours=data.get('opening_hours'),
+            submitted_by=data.get('submitted_by', 'Anonymous')
+        )
+        geocode_resource(resource)
+        resource.start_decayed_rating(datetime.utcnow())
+        
+        db.session.add(resource)
+        db.session.flush()
+        record(RESOURCE_CREATED, resource)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Resource added successfully!',
+            'resource': resource.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error adding resource: {str(e)}'
+        }), 400
+
+@bp.route('/api/resources/<int:resource_id>/rate', methods=['POST'])
+def rate_resource(resource_id):
+    data = request.get_json()
+    user_ip = request.remote_addr
+    
+    # Check if user already rated this resource
+    existing_rating = Rating.query.filter_by(
+        resource_id=resource_id,
+        user_ip=user_ip
+    ).first()
+    
+    if existing_rating:
+        return jsonify({
+            'success': False,
+            'message': 'You have already rated this resource'
+        }), 400
+    
+    resource = db.session.get(Resource, resource_id)
+    if resource is None:
+        return jsonify({
+            'success': False,
+            'message': 'Resource not found'
+        }), 404
+    
+    # Out-of-range stars would be baked into the decayed sums and the event log
+    try:
+        stars = int(data['rating'])
+        valid = not isinstance(data['rating'], bool) and float(data['rating']) == stars and 1 <= stars <= 5
+    except (TypeError, KeyError, ValueError):
+        valid = False
+    if not valid:
+        return jsonify({
+            'success': False,
+            'message': 'Rating must be a whole number from 1 to 5'
+        }), 400
+    
+    try:
+        # One timestamp for the row and the decayed scores, so replaying
+        # the event log reproduces the same aggregates
+        now = datetime.utcnow()
+        rating = Rating(
+            resource_id=resource_id,
+            rating=stars,
+            comment=data.get('comment', ''),
+            created_at=now,
+            user_ip=user_ip
+        )
+        
+        db.session.add(rating)
+        
+        # Update resource rating
+        resource.add_rating(stars, now=now)
+        db.session.flush()
+        record(RATING_CREATED, rating)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Rating added successfully!',
+            'rating_id': rating.id,
+            'new_rating': resource.rating,
+            'recent_rating': resource.recent_rating,
+            'score': resource.score
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error adding rating: {str(e)}'
+        }), 400
+
+@bp.route('/api/resources/<int:resource_id>/photos')
+def get_photos(resource_id):
+    photos = Photo.query.filter_by(resource_id=resource_id).order_by(Photo.created_at.desc()).all()
+    return jsonify([photo.to_dict() for photo in photos])
+
+@bp.route('/api/resources/<int:resource_id>/photos', methods=['POST'])
+def upload_photo(resource_id):
+    # Accepts either a raw image body (streamed straight to disk) or a
+    # multipart form with a `photo` file field (buffered by Werkzeug first;
+    # MAX_CONTENT_LENGTH bounds both)
+    rating_id = request.args.get('rating_id', type=int)
+    
+    if request.content_length and request.content_length > current_app.config['PHOTO_MAX_BYTES'] + 64 * 1024:
+        return jsonify({
+            'success': False,
+            'message': 'Photo is too large'
+        }), 413
+    
+    resource = db.session.get(Resource, resource_id)
+    if resource is None:
+        return jsonify({
+            'success': False,
+            'message': 'Resource not found'
+        }), 404
+    
+    if rating_id is not None:
+        rating = db.session.get(Rating, rating_id)
+        if rating is None or rating.resource_id != resource_id:
+            return jsonify({
+                'success': False,
+                'message': 'Rating not found for this resource'
+            }), 404
+    
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('photo')
+            if upload is None:
+                raise PhotoError('No photo was uploaded')
+            stream = upload.stream
+        else:
+            stream = request.stream
+        digest, size, content_type = photo_store.save_stream(stream)
+    except PhotoError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    photo = Photo.query.filter_by(resource_id=resource_id, sha256=digest).first()
+    if photo is None:
+        photo = Photo(
+            resource_id=resource_id,
+            rating_id=rating_id,
+            sha256=digest,
+            content_type=content_type,
+            size=size,
+            user_ip=request.remote_addr
+        )
+        db.session.add(photo)
+        db.session.flush()
+        record(PHOTO_CREATED, photo)
+        db.session.commit()
+    
+    photo_store.submit_thumbnail(digest)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Photo uploaded successfully!',
+        'photo': photo.to_dict()
+    })
+
+@bp.route('/photos/<digest>')
+@bp.route('/photos/<digest>/<variant>')
+def photo_file(digest, variant=None):
+    if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest) or variant not in (None, 'thumb'):
+        return jsonify({'success': False, 'message': 'Photo not found'}), 404
+    
+    path = photo_store.path_for(digest, thumbnail=variant == 'thumb')
+    etag = digest + (variant or '')
+    immutable = True
+    if variant == 'thumb' and not os.path.exists(path):
+        # Thumbnail not generated yet: serve the original under its own
+        # ETag, so revalidating later fetches the real thumbnail, and don't
+        # let it be cached for good
+        path = photo_store.path_for(digest)
+        etag = digest
+        immutable = False
+    if not os.path.exists(path):
+        return jsonify({'success': False, 'message': 'Photo not found'}), 404
+    
+    # Files are self-describing, so serving them needs no database access
+    with open(path, 'rb') as f:
+        mimetype = sniff_content_type(f.read(12)) or 'application/octet-stream'
+    
+    # Content never changes for a given hash; conditional=True adds
+    # ETag/Last-Modified handling and Range support
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag)
+    if immutable:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@bp.route('/api/search')
+def search_resources():
+    resources_query = filter_resources(Resource.query, request.args, search=True)
+    resources = resources_query.all()
+    return jsonify([resource.to_dict() for resource in resources])
+
+@bp.route('/api/cities')
+def get_cities():
+    cities = db.session.query(Resource.city).distinct().all()
+    return jsonify([city[0] for city in cities if city[0]])
+
+@bp.route('/api/coverage')
+def get_coverage_map():
+    city = canonical_city(request.args.get('city', ''))
+    polygons = city_boundary(city)
+    if polygons is None:
+        return jsonify({
+            'success': False,
+            'message': 'Unknown city'
+        }), 400
+    
+    resolution = request.args.get('resolution', 250, type=int)
+    if resolution not in RESOLUTIONS_M:
+        return jsonify({
+            'success': False,
+            'message': f'Resolution must be one of {", ".join(map(str, RESOLUTIONS_M))} metres'
+        }), 400
+    
+    output = request.args.get('format', 'grid')
+    encoding = request.args.get('encoding', 'json')
+    resource_type = request.args.get('type', 'water')
+    walk_km = request.args.get('walk_km', current_app.config['COVERAGE_WALK_KM'], type=float)
+    if output not in ('grid', 'geojson') or resource_type not in RESOURCE_TYPES:
+        return jsonify({
+            'success': False,
+            'message': 'Format must be grid or geojson, and type water or washroom'
+        }), 400
+    if not 0 < walk_km < MAX_DISTANCE_KM:
+        return jsonify({
+            'success': False,
+            'message': f'walk_km must be between 0 and {MAX_DISTANCE_KM:g}'
+        }), 400
+    if encoding not in ('json', 'packed'):
+        return jsonify({
+            'success': False,
+            'message': 'Encoding must be json or packed'
+        }), 400
+    
+    try:
+        grid = get_coverage(city, resolution, polygons)
+    except CoverageError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    if output == 'geojson':
+        response = jsonify(grid.gaps_geojson(resource_type, walk_km))
+        response.mimetype = 'application/geo+json'
+        return response
+    if encoding == 'packed':
+        return jsonify(grid.to_packed())
+    return jsonify(grid.to_grid())
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({
+        'success': False,
+        'message': 'Request is too large'
+    }), 413